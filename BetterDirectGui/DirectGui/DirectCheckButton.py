@@ -101,9 +101,8 @@ class DirectCheckButton(DirectButton):
         self.add_theming_options(kw, parent, DirectCheckButton)
 
     def _indicator_update_func(self, **kwargs):
-        for key in kwargs:
-            if "text" in key:
-                return
+        if all("text" in key for key in kwargs):
+            return
 
         self.indicator.resetFrameSize()
 
@@ -158,6 +157,8 @@ class DirectCheckButton(DirectButton):
 
     # Override the resetFrameSize of DirectGuiWidget inorder to provide space for label
     def resetFrameSize(self):
+        if self._defer_frame_update():
+            return
         self.setFrameSize(fClearFrame = 1)
 
     def setFrameSize(self, fClearFrame = 0):
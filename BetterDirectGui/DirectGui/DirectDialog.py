@@ -122,6 +122,8 @@ class DirectDialog(DirectFrame):
             ('extraArgs',         [],            None),
             ('sortOrder',    DGG.NO_FADE_SORT_INDEX, None),
             ('selectable',        False,         None),
+            # Confine keyboard navigation to the dialog while it is shown
+            ('focusScope',        False,         self._update_focus_scope),
             )
 
         if base.gui_controller.no_initopts:
@@ -450,16 +452,24 @@ class DirectDialog(DirectFrame):
 
         self._update_pad(set_frameSize=False)
 
+    def _update_focus_scope(self):
+        if self['focusScope'] and not self.isHidden():
+            base.gui_controller.push_focus_scope(self)
+        else:
+            base.gui_controller.pop_focus_scope(self)
+
     def show(self):
         if self['fadeScreen']:
             base.transitions.fadeScreen(self['fadeScreen'])
             self.setBin('gui-popup', 0)
-        NodePath.show(self)
+        super().show()
+        self._update_focus_scope()
 
     def hide(self):
         if self['fadeScreen']:
             base.transitions.noTransitions()
-        NodePath.hide(self)
+        super().hide()
+        self._update_focus_scope()
 
     def buttonCommand(self, value, event = None):
         if self['command']:
@@ -137,6 +137,8 @@ class DirectEntry(DirectFrame):
         # listen for auto-capitalize events on a separate object to prevent
         # clashing with other parts of the system
         self._autoCapListener = DirectObject()
+        # listens for typing when 'enteredText' is observed, see _start_observing
+        self._typeListener = None
 
         # Call option initialization functions
         self.initialiseoptions(DirectEntry)
@@ -212,8 +214,25 @@ class DirectEntry(DirectFrame):
     def destroy(self):
         self.ignoreAll()
         self._autoCapListener.ignoreAll()
+        if self._typeListener is not None:
+            self._typeListener.ignoreAll()
         DirectFrame.destroy(self)
 
+    def _start_observing(self, option):
+        # typing doesn't configure 'enteredText', so listen for it on a separate object (like _autoCapListener)
+        if option == "enteredText" and self._typeListener is None:
+            self._typeListener = DirectObject()
+            self._typeListener.accept(self.guiItem.getTypeEvent(), self._textChanged)
+            self._typeListener.accept(self.guiItem.getEraseEvent(), self._textChanged)
+
+    def _textChanged(self, guiEvent):
+        self._option_changed("enteredText")
+
+    def _get_observed_value(self, option):
+        if option == "enteredText":
+            return self.get()
+        return super()._get_observed_value(option)
+
     def setup(self):
         self.guiItem.setupMinimal(self['width'], self['numLines'])
 
@@ -356,6 +375,7 @@ class DirectEntry(DirectFrame):
 
         if base.gui_controller.no_initopts:
             self._optionInfo["enteredText"][DGG._OPT_VALUE] = text
+        self._option_changed("enteredText")
 
     def get(self, plain = False):
         """ Returns the text currently showing in the typable region.
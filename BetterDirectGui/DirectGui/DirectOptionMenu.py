@@ -126,9 +126,8 @@ class DirectOptionMenu(DirectButton):
         self.add_theming_options(kw, parent, DirectOptionMenu)
 
     def _comp_update_func(self, **kwargs):
-        for key in kwargs:
-            if "text" in key:
-                return
+        if all("text" in key for key in kwargs):
+            return
         self.setItems()
 
     def _update_marker_border(self):
@@ -184,6 +183,8 @@ class DirectOptionMenu(DirectButton):
         """
         # Remove old component if it exits
         if self.popupMenu != None:
+            # leave the focus scope of the old popup, hidePopupMenu below only sees the new one
+            base.gui_controller.pop_focus_scope(self.popupMenu)
             self.destroycomponent('popupMenu')
         # Create new component
         self.popupMenu = self.createcomponent('popupMenu', (), None,
@@ -293,6 +294,11 @@ class DirectOptionMenu(DirectButton):
         Adjust popup position if default position puts it outside of
         visible screen region
         """
+        # Apply the themes set while the popup was hidden before showing it,
+        # since theming the components can rebuild the popup (see setItems)
+        self.cancelFrame._apply_pending_theme()
+        self.popupMenu._apply_pending_theme()
+
         # Needed attributes (such as minZ) won't be set unless the user has specified
         # items to display. Let's assert that we've given items to work with.
         items = self['items']
@@ -341,11 +347,14 @@ class DirectOptionMenu(DirectButton):
         # Position and scale cancel frame to fill entire window
         self.cancelFrame.setPos(ShowBaseGlobal.render2d, 0, 0, 0)
         self.cancelFrame.setScale(ShowBaseGlobal.render2d, 1, 1, 1)
+        # Keyboard navigation stays in the popup while it is shown
+        base.gui_controller.push_focus_scope(self.popupMenu)
 
     def hidePopupMenu(self, event=None, skip_key_handling=False):
         """ Put away popup and cancel frame """
         self.popupMenu.hide()
         self.cancelFrame.hide()
+        base.gui_controller.pop_focus_scope(self.popupMenu)
         if base.gui_controller.do_keyboard_navigation:
             self.ignore_keyboard_navigation()
             if not self.fInit and not skip_key_handling:
@@ -135,9 +135,8 @@ class DirectRadioButton(DirectButton):
         self.add_theming_options(kw, parent, DirectRadioButton)
 
     def _indicator_update_func(self, **kwargs):
-        for key in kwargs:
-            if "text" in key:
-                return
+        if all("text" in key for key in kwargs):
+            return
 
         self.indicator.resetFrameSize()
 
@@ -193,6 +192,8 @@ class DirectRadioButton(DirectButton):
 
     # Override the resetFrameSize of DirectGuiWidget inorder to provide space for label
     def resetFrameSize(self):
+        if self._defer_frame_update():
+            return
         self.setFrameSize(fClearFrame = 1)
 
     def setFrameSize(self, fClearFrame = 0):
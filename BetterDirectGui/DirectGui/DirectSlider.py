@@ -183,6 +183,7 @@ class DirectSlider(DirectFrame):
     def commandFunc(self):
         # Store the updated value in self['value']
         self._optionInfo['value'][DGG._OPT_VALUE] = self.guiItem.getValue()
+        self._option_changed('value')
 
         if self['command']:
             self['command'](*self['extraArgs'])
@@ -11,35 +11,26 @@ __all__ = ['OnscreenImage']
 
 
 class OnscreenImage(oi.OnscreenImage):
-    def __init__(self,
-                 image=None,
-                 pos=None,
-                 hpr=None,
-                 scale=None,
-                 color=None,
-                 parent=None,
-                 sort=0):
-        super().__init__(image,
-                         pos,
-                         hpr,
-                         scale,
-                         color,
-                         parent,
-                         sort)
-
-        self._defaults: dict[str: Any] = {}
-        self._set_default()
+    # The values of the options when self was created, used to reset options set by a theme (see get_default).
+    # They are read the first time self is configured (or the first time they are needed),
+    # instead of when self is created, since most images are never changed.
+    _defaults: dict[str: Any] | None = None
+    _default_options = ("image", "pos", "hpr", "scale", "color", "parent", "sort")
 
     def _set_default(self):
-        self._defaults["image"] = self["image"]
-        self._defaults["pos"] = self["pos"]
-        self._defaults["hpr"] = self["hpr"]
-        self._defaults["scale"] = self["scale"]
-        self._defaults["color"] = self["color"]
-        self._defaults["parent"] = self["parent"]
-        self._defaults["sort"] = self["sort"]
+        self._defaults = {option: self[option] for option in self._default_options}
 
         for key, value in self._defaults.items():
             # Trying to copy some options can cause a crash, so only copy what we have to.
             if isinstance(value, (MutableSet, MutableSequence, MutableMapping)):
                 self._defaults[key] = deepcopy(value)
+
+    def get_default(self, option: str) -> Any:
+        if self._defaults is None:  # self has not been changed, so the current values are the defaults
+            self._set_default()
+        return self._defaults[option]
+
+    def configure(self, option=None, **kw):
+        if self._defaults is None:
+            self._set_default()
+        super().configure(option, **kw)
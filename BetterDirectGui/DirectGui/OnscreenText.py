@@ -17,69 +17,20 @@ BlackOnWhite = ot.BlackOnWhite
 
 
 class OnscreenText(ot.OnscreenText):
-    def __init__(self, text = '',
-                 style = ot.Plain,
-                 pos = (0, 0),
-                 roll = 0,
-                 scale = None,
-                 fg = None,
-                 bg = None,
-                 shadow = None,
-                 shadowOffset = (0.04, 0.04),
-                 frame = None,
-                 align = None,
-                 wordwrap = None,
-                 drawOrder = None,
-                 decal = 0,
-                 font = None,
-                 parent = None,
-                 sort = 0,
-                 mayChange = True,
-                 direction = None):
-        super().__init__(text,
-                         style,
-                         pos,
-                         roll,
-                         scale,
-                         fg,
-                         bg,
-                         shadow,
-                         shadowOffset,
-                         frame,
-                         align,
-                         wordwrap,
-                         drawOrder,
-                         decal,
-                         font,
-                         parent,
-                         sort,
-                         mayChange,
-                         direction)
-
-        self._defaults: dict[str: Any] = {}
-        self._set_default()
+    # The values of the options when self was created, used to reset options set by a theme (see get_default).
+    # They are read the first time self is configured (or the first time they are needed),
+    # instead of when self is created, since most texts are never changed.
+    _defaults: dict[str: Any] | None = None
+    _default_options = ("text", "pos", "x", "y", "roll", "scale", "fg", "bg", "shadow", "shadowOffset", "frame",
+                        "align", "wordwrap", "drawOrder", "decal", "font", "parent", "sort",
+                        # "mayChange",
+                        "direction")
 
     def _set_default(self):
-        self._defaults["text"] = self["text"]
-        self._defaults["pos"] = self["pos"]
-        self._defaults["x"] = self["x"]
-        self._defaults["y"] = self["y"]
-        self._defaults["roll"] = self["roll"]
-        self._defaults["scale"] = self["scale"]
-        self._defaults["fg"] = self["fg"]
-        self._defaults["bg"] = self["bg"]
-        self._defaults["shadow"] = self["shadow"]
-        self._defaults["shadowOffset"] = self["shadowOffset"]
-        self._defaults["frame"] = self["frame"]
-        self._defaults["align"] = self["align"]
-        self._defaults["wordwrap"] = self["wordwrap"]
-        self._defaults["drawOrder"] = self["drawOrder"]
-        self._defaults["decal"] = self["decal"]
-        self._defaults["font"] = self["font"]
-        self._defaults["parent"] = self["parent"]
-        self._defaults["sort"] = self["sort"]
-        # self._defaults["mayChange"] = self["mayChange"]
-        self._defaults["direction"] = self["direction"]
+        options = self._default_options
+        if self.isEmpty():  # the node has been removed (like the text of a DirectEntry), so x and y can't be read
+            options = [option for option in options if option not in ("x", "y")]
+        self._defaults = {option: self[option] for option in options}
 
         for key, value in self._defaults.items():
             # Trying to copy some options can cause a crash, so only copy what we have to.
@@ -87,8 +38,15 @@ class OnscreenText(ot.OnscreenText):
                 self._defaults[key] = deepcopy(value)
 
     def get_default(self, option: str) -> Any:
+        if self._defaults is None:  # self has not been changed, so the current values are the defaults
+            self._set_default()
         return self._defaults[option]
 
+    def configure(self, option=None, **kw):
+        if self._defaults is None:
+            self._set_default()
+        super().configure(option, **kw)
+
     def cget(self, option):
         # Get current configuration setting.
         # This is for compatibility with DirectGui functions
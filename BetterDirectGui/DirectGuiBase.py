@@ -4,10 +4,13 @@ from __future__ import annotations
 import direct.gui.DirectGuiBase as DirectGuiBase
 import direct.gui.DirectGuiGlobals as DGG
 import panda3d.core as p3d
-from BetterDirectGui.GuiTools import GuiUtil
+from BetterDirectGui.GuiTools import GuiUtil, ThemeUtil
+from BetterDirectGui.GuiTools.TextureAtlas import AtlasRegion
 
-from typing import Any
-from collections.abc import MutableSequence, MutableMapping, MutableSet
+from typing import Any, Callable
+from types import MappingProxyType
+from collections.abc import MutableSequence, MutableMapping, MutableSet, Mapping
+from contextlib import contextmanager
 from copy import deepcopy
 
 from typing import TYPE_CHECKING
@@ -21,34 +24,121 @@ DGG.MWUP = p3d.PGButton.getPressPrefix() + p3d.MouseButton.wheel_up().getName()
 DGG.MWDOWN = p3d.PGButton.getPressPrefix() + p3d.MouseButton.wheel_down().getName() + '-'
 
 
+class CopyOnWriteDict(MutableMapping):
+    """Dict that reads from a shared (read-only) dict until it is changed, then it makes its own copy of it.
+    Used as value for options with a MappingProxyType as default, so widgets only get their own dict when needed.
+    The copy is shallow, the values are shared with the default."""
+    __slots__ = ("_data", "_shared")
+
+    def __init__(self, shared: Mapping):
+        self._data = shared
+        self._shared = True
+
+    def _make_private(self):
+        if self._shared:
+            self._data = dict(self._data)
+            self._shared = False
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __setitem__(self, key, value):
+        self._make_private()
+        self._data[key] = value
+
+    def __delitem__(self, key):
+        self._make_private()
+        del self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __eq__(self, other):
+        if isinstance(other, CopyOnWriteDict):
+            other = other._data
+        return self._data == other
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self._data)!r})"
+
+    def copy(self) -> CopyOnWriteDict:
+        """Return a new CopyOnWriteDict, that shares the data of self until one of them is changed."""
+        if self._shared:
+            return type(self)(self._data)
+        return type(self)(MappingProxyType(dict(self._data)))
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+
 class DirectGuiWidget(DirectGuiBase.DirectGuiWidget):
     """Subclass of DirectGuiWidget with keyboard navigation support."""
 
-    def __init__(self, parent=None, **kw):
-        # True for default implementation (using node-graph to infer jump order)
-        # False for disabled
-        # To specify a jump explicitly, pass the object that should be jumped to
-        navigationMap = {
-            "u": True,  # 'up' move upward (by default upwards in the node-graph)
-            "d": True,  # 'down' inverse of 'up'
-            "l": True,  # 'left' move left (to next gui node at the current level of the node-graph)
-            "r": True,  # 'right' inverse of 'left'
-            "i": False,  # 'inward'
-            "o": False,  # 'outward'
-
-            "f": True,  # 'forward' move to next item (to next gui node in the node-graph)
-            "b": True  # 'backward' inverse of 'forward' (backward in the node-graph)
-        }
+    # The bookkeeping used for theming and keyboard navigation is stored in slots instead of the instance dict,
+    # since there can be thousands of widgets (like the items of a list)
+    __slots__ = ("_kw", "_dont_edit", "_theme", "_theme_priority", "_pending_theme", "_is_child_of_scrolled_frame",
+                 "_scale", "_color_scale", "_counted_selectable")
+
+    # Shared by widgets without any options set by the user (_kw) or handled by an ancestor (_dont_edit),
+    # replaced with a dict/set of its own the first time something is added
+    _no_user_options: Mapping[str, Any] = MappingProxyType({})
+    _nothing_handled: frozenset[str] = frozenset()
+
+    # Resolved theme options, shared by all widgets of the same class.
+    # Maps id(theme) to (theme, {widget class: read-only options}).
+    # Themes from ThemeUtil are used as keys directly, so equal themes share their resolved options
+    _theme_cache: dict[int | ThemeUtil.Theme, tuple[dict, dict[type, Mapping[str, Any]]]] = {}
+    # Max number of themes to keep resolved options for
+    _theme_cache_size = 32
+    # Frame updates collected while applying a theme, maps widget to [reset frame, component update kwargs].
+    # None when updates are not deferred.
+    _deferred_updates: dict[DirectGuiWidget, list] | None = None
+    # Atlas regions used by the frame of each state, maps state index to region
+    _atlas_regions: dict[int, AtlasRegion] = {}
+    # The widget that self is a component of, and the name of self in that widget (set in createcomponent)
+    _component_owner: DirectGuiWidget | None = None
+    _component_name: str | None = None
+    # Options set inside a 'batch' block, applied when the block exits. None when self is not in a batch block.
+    _batched_options: dict[str, Any] | None = None
+    # Callbacks for each observed option of self, see 'observe'. None when no option of self is observed.
+    _observers: dict[str, list[Callable[[Any], None]]] | None = None
+
+    # Default for the 'navigationMap' option, shared by all widgets. Each widget reads it through a
+    # CopyOnWriteDict, that copies it the first time the navigationMap of that widget is changed.
+    # True for default implementation (using node-graph to infer jump order)
+    # False for disabled
+    # To specify a jump explicitly, pass the object that should be jumped to
+    _default_navigation_map = MappingProxyType({
+        "u": True,  # 'up' move upward (by default upwards in the node-graph)
+        "d": True,  # 'down' inverse of 'up'
+        "l": True,  # 'left' move left (to next gui node at the current level of the node-graph)
+        "r": True,  # 'right' inverse of 'left'
+        "i": False,  # 'inward'
+        "o": False,  # 'outward'
+
+        "f": True,  # 'forward' move to next item (to next gui node in the node-graph)
+        "b": True  # 'backward' inverse of 'forward' (backward in the node-graph)
+    })
 
+    def __init__(self, parent=None, **kw):
         optiondefs = (
             # Is this element able to be selected, or is it skipped when navigating with keyboard
-            ('selectable',     False,         None),
+            ('selectable',     False,         self._set_selectable),
             # Is this element the currently selected element (activates when user presses "enter")
             ('selected',       False,         self.set_selected),
             # if user should be able to exit this element with some key from "allowed_directions_while_selected" while this element is selected
             ('allowExit',      True,          None),
             # map to specify explicitly how to navigate from this element
-            ('navigationMap',  navigationMap, None)
+            ('navigationMap',  self._default_navigation_map, None)
         )
 
         if base.gui_controller.no_initopts:
@@ -66,17 +156,23 @@ class DirectGuiWidget(DirectGuiBase.DirectGuiWidget):
 
         # Do not override if it already exists
         if not hasattr(self, "_kw"):
-            self._kw = {}
+            self._kw = self._no_user_options
         if not hasattr(self, "_theme"):
             self._theme: dict[str, dict[str: Any]] | None = None
             self._theme_priority = -1
-        self._dont_edit: set[str] = set()  # set of stuff not to touch when setting a theme, this has already been handled
+        self._dont_edit: set[str] | frozenset[str] = self._nothing_handled  # set of stuff not to touch when setting a theme, this has already been handled
+        self._pending_theme: tuple | None = None  # theme to set when self is shown, if it was set while self was hidden
 
         # Merge keyword options with default options
         self.defineoptions(kw, optiondefs)
 
         # Initialize the base classes (after defining the options).
         DirectGuiBase.DirectGuiWidget.__init__(self, parent)
+        self.guiItem.setPythonTag(GuiUtil.widget_tag, self)  # lets GuiUtil find self from the node
+        # add self to the counts used by GuiUtil.has_gui, counted as selectable once the option is initialized
+        self._counted_selectable = False
+        GuiUtil._add_to_ancestors(self, 1)
+        self._clear_parent_caches()
 
         # Call option initialization functions
         self.initialiseoptions(DirectGuiWidget)
@@ -91,21 +187,180 @@ class DirectGuiWidget(DirectGuiBase.DirectGuiWidget):
         # Apply the theme to self
         self.add_theming_options(kw, parent, DirectGuiWidget)
 
+    def destroy(self):
+        if hasattr(self, "guiItem"):  # not destroyed yet
+            self.guiItem.clearPythonTag(GuiUtil.widget_tag)
+            self.guiItem.clearPythonTag(GuiUtil.children_tag)
+            base.gui_controller.pop_focus_scope(self)  # if self is the root of a focus scope
+        super().destroy()
+
+    @contextmanager
+    def _updating_ancestors(self):
+        """Keep what the ancestors of self know about self up to date, for changes in the block that affect it.
+        Self (and the widgets below self) is removed from the counts of the ancestors while the block is run
+        and added again after, and the cached children of the parent (and the tab order) are cleared before and after."""
+        if not hasattr(self, "_counted_selectable") or self.isEmpty():  # not counted
+            yield
+            return
+
+        GuiUtil._add_to_ancestors(self, -1)
+        self._clear_parent_caches()
+        try:
+            yield
+        finally:
+            if not self.isEmpty():
+                GuiUtil._add_to_ancestors(self, 1)
+                self._clear_parent_caches()
+
+    def _clear_parent_caches(self):
+        """Clear what the parent of self (and the gui controller) has cached about its children."""
+        GuiUtil._clear_children_cache(self)
+        base.gui_controller._invalidate_tab_order()
+
+    def _set_selectable(self):
+        with self._updating_ancestors():
+            self._counted_selectable = bool(self["selectable"])
+
     def hide(self, *args):
-        super().hide(*args)
+        with self._updating_ancestors():
+            super().hide(*args)
         if base.gui_controller.do_keyboard_navigation and self["selected"]:
             self["selected"] = False
             base.gui_controller.activate_keys()
 
     def stash(self, *args, **kwargs):
-        super().stash(*args, **kwargs)
+        with self._updating_ancestors():
+            super().stash(*args, **kwargs)
         if base.gui_controller.do_keyboard_navigation and self["selected"]:
             self["selected"] = False
             base.gui_controller.activate_keys()
 
+    def show(self, *args):
+        with self._updating_ancestors():
+            super().show(*args)
+        self._apply_pending_theme()
+
+    def unstash(self, *args, **kwargs):
+        with self._updating_ancestors():
+            super().unstash(*args, **kwargs)
+        self._apply_pending_theme()
+
+    def detachNode(self, *args, **kwargs):
+        with self._updating_ancestors():
+            super().detachNode(*args, **kwargs)
+
+    detach_node = detachNode
+
+    def removeNode(self, *args, **kwargs):
+        with self._updating_ancestors():
+            super().removeNode(*args, **kwargs)
+
+    remove_node = removeNode
+
     def _comp_update_func(self, **kwargs):
         self.resetFrameSize()
 
+    def resetFrameSize(self):
+        if self._defer_frame_update():
+            return
+        super().resetFrameSize()
+
+    def setFrameTexture(self):
+        # Same as in DirectGui, but also allows AtlasRegions
+        textures = self['frameTexture']
+        if isinstance(textures, AtlasRegion):
+            textures = (textures,) * self['numStates']
+        elif not isinstance(textures, (list, tuple)) or not any(isinstance(texture, AtlasRegion) for texture in textures):
+            if self._atlas_regions:
+                self._set_atlas_regions({})
+            super().setFrameTexture()
+            return
+
+        regions = {}
+        for i in range(self['numStates']):
+            texture = textures[min(i, len(textures) - 1)]
+            if isinstance(texture, AtlasRegion):
+                regions[i] = texture
+                texture = texture.texture
+            elif isinstance(texture, str):
+                texture = base.loader.loadTexture(texture)
+            if texture:
+                self.frameStyle[i].setTexture(texture)
+            else:
+                self.frameStyle[i].clearTexture()
+        self._set_atlas_regions(regions)
+        self.updateFrameStyle()
+
+    def _set_atlas_regions(self, regions: dict[int, AtlasRegion]):
+        """Map the uv-coordinates of the frame of each state to its region in the atlas."""
+        self._atlas_regions = regions
+        stage = p3d.TextureStage.getDefault()
+        for i, state_np in enumerate(self.stateNodePath):
+            if i in regions:
+                state_np.setTexTransform(stage, regions[i].transform)
+            else:
+                state_np.clearTexTransform(stage)
+        self._update_atlas_components()
+
+    def _update_atlas_components(self):
+        """The texture transform of the frame is inherited by the components in the state nodes (like text),
+        so undo it for them."""
+        stage = p3d.TextureStage.getDefault()
+        for name in self.components():
+            component = self.component(name)
+            if not isinstance(component, p3d.NodePath) or component.isEmpty():
+                continue
+            parent = component.getParent()
+            for i, state_np in enumerate(self.stateNodePath):
+                if parent != state_np:
+                    continue
+                if i in self._atlas_regions:
+                    component.setTexTransform(stage, self._atlas_regions[i].transform.getInverse())
+                else:
+                    component.clearTexTransform(stage)
+                break
+
+    def _defer_frame_update(self) -> bool:
+        """Postpone resetting the frame of self if frame updates are currently deferred."""
+        pending = DirectGuiWidget._deferred_updates
+        if pending is None or self.fInit:  # nothing is done while self is initialised anyway
+            return False
+
+        pending.setdefault(self, [False, {}])[0] = True
+        return True
+
+    def _queue_comp_update(self, **kwargs):
+        """Call '_comp_update_func' now, or once for all the options changed if frame updates are deferred."""
+        pending = DirectGuiWidget._deferred_updates
+        if pending is None:
+            self._comp_update_func(**kwargs)
+        else:
+            pending.setdefault(self, [False, {}])[1].update(kwargs)
+
+    @staticmethod
+    @contextmanager
+    def _deferred_frame_updates():
+        """Collect the frame updates made inside the block and do them once per widget when the outermost block exits.
+        The deepest widgets are updated first, since the frame of a widget can depend on its components."""
+        if DirectGuiWidget._deferred_updates is not None:  # an outer block will do the updates
+            yield
+            return
+
+        pending = DirectGuiWidget._deferred_updates = {}
+        try:
+            yield
+        finally:
+            DirectGuiWidget._deferred_updates = None
+            widgets = [widget for widget in pending if hasattr(widget, "_optionInfo")]  # skip destroyed widgets
+            widgets.sort(key=lambda widget: widget.getNumNodes(), reverse=True)
+            for widget in widgets:
+                reset, kwargs = pending[widget]
+                if kwargs:
+                    widget._comp_update_func(**kwargs)
+                # some _comp_update_funcs (like the one of the indicators) skip the reset for some options
+                if reset:
+                    widget.resetFrameSize()
+
     def createcomponent(
         self,
         componentName,
@@ -129,7 +384,13 @@ class DirectGuiWidget(DirectGuiBase.DirectGuiWidget):
                 itemKW[i.removeprefix(f"{componentName}_")] = self._kw[i]
 
         kw.update(itemKW)
-        return super().createcomponent(componentName, componentAliases, componentGroup, widgetClass, *widgetArgs, **kw)
+        component = super().createcomponent(componentName, componentAliases, componentGroup, widgetClass, *widgetArgs, **kw)
+        if isinstance(component, DirectGuiWidget):
+            component._component_owner = self
+            component._component_name = componentName
+        if self._atlas_regions:
+            self._update_atlas_components()
+        return component
 
     def _handle_parent_scrolling(self):
         # Make sure that children of DirectScrolledFrames get bound to scroll events
@@ -143,9 +404,8 @@ class DirectGuiWidget(DirectGuiBase.DirectGuiWidget):
         for ancestor in ancestors:
             if ancestor.name == "canvas":
                 node = ancestor.parent.parent
-                name = node.name.split("-")[-1]
                 try:
-                    self._is_child_of_scrolled_frame = self.guiDict[name].setup_scroll_bind(self)
+                    self._is_child_of_scrolled_frame = GuiUtil.get_gui(node).setup_scroll_bind(self)
                 except AttributeError:
                     pass
 
@@ -153,13 +413,15 @@ class DirectGuiWidget(DirectGuiBase.DirectGuiWidget):
 
     # is needed to make sure scrolling is updated in all directScrolledFrames
     def reparentTo(self, *args, **kwargs):
-        super().reparentTo(*args, **kwargs)
+        with self._updating_ancestors():
+            super().reparentTo(*args, **kwargs)
         self._handle_parent_scrolling()
 
     reparent_to = reparentTo
 
     def wrtReparentTo(self, *args, **kwargs):
-        super().wrtReparentTo(*args, **kwargs)
+        with self._updating_ancestors():
+            super().wrtReparentTo(*args, **kwargs)
         self._handle_parent_scrolling()
 
     wrt_reparent_to = wrtReparentTo
@@ -231,6 +493,9 @@ class DirectGuiWidget(DirectGuiBase.DirectGuiWidget):
                     else:
                         # Use optionDefs value
                         value = default
+                        if type(default) is MappingProxyType:  # shared default, copied when changed
+                            optionInfo[name] = [default, CopyOnWriteDict(default), function]
+                            continue
                         if isinstance(default, (MutableSequence, MutableMapping, MutableSet)):  # some bug fixing
                             value = deepcopy(default)
                         optionInfo[name] = [default, value, function]
@@ -245,26 +510,68 @@ class DirectGuiWidget(DirectGuiBase.DirectGuiWidget):
                 if not keywords_has_key(name):
                     keywords[name] = [default, 0]
 
-    def set_theme(self, theme: dict, priority=0, clear_old_theme=True):
+    def set_theme(self, theme: dict, priority=0, clear_old_theme=True, diff=False):
         """Set theme of this element and its children to the specified theme.
         The method to call to change the theme after widget creation.
 
         :param theme: The new theme.
         :param priority: Requires a higher value than the current themes priority to override.
         :param clear_old_theme: Option to reset all options set by the old theme before setting the new one.
+        :param diff: Only reconfigure the options whose values differ between the old and the new theme,
+         instead of resetting every option of the old theme and then setting them all again.
         """
+        # The theme might have been edited since it was last used
+        self.invalidate_theme_cache(theme)
+        self._propagate_theme([self], theme, priority, clear_old_theme, diff)
+
+    @staticmethod
+    def _propagate_theme(widgets: list[DirectGuiWidget], theme: dict, priority=0, clear_old_theme=True, diff=False,
+                         force=False):
+        """Set the theme of widgets and of all their gui descendants, in a single pass over the scene-graph.
+        The descendants of a widget that keeps its current theme (because of its priority) are skipped.
+        With force, widgets are themed even if they are hidden (their hidden descendants are still themed lazily)."""
+        with DirectGuiWidget._deferred_frame_updates():
+            for widget in widgets:
+                if not widget._set_theme(theme, priority, clear_old_theme, diff, force):
+                    continue
+
+                stack = GuiUtil.add_gui_children(widget, [])
+                while stack:
+                    child = stack.pop()
+                    if child._set_theme(theme, priority, diff=diff):
+                        GuiUtil.add_gui_children(child, stack)
+
+    def _set_theme(self, theme: dict, priority=0, clear_old_theme=True, diff=False, force=False) -> bool:
+        """Set the theme of self, but not of its children (see _propagate_theme).
+        Returns False if the priority was too low for the theme to be set, or if it is set when self is shown
+        (unless force is set)."""
         if priority <= self._theme_priority:
-            return
-
-        if clear_old_theme:
-            self.clear_theme()  # reset any options set by the last theme
-
-        self._theme_priority = priority
-        self._theme = theme
-        self._apply_theme()
+            return False
+
+        if not force and base.gui_controller.lazy_theming and self._is_hidden_for_theming():
+            # theme self and its children when self is shown again
+            if self._pending_theme is None or priority > self._pending_theme[1]:
+                self._pending_theme = (theme, priority, clear_old_theme, diff)
+            return False
+
+        with self._deferred_frame_updates():
+            if clear_old_theme:
+                if not diff:
+                    self._clear_theme(propagate=False)  # reset any options set by the last theme
+                elif self._theme is not None:
+                    # only reset the options that the new theme does not set
+                    old_options = self._get_theme_options(self._theme)
+                    new_options = self._get_theme_options(theme)
+                    self._reset_theme_options({key: value for key, value in old_options.items() if key not in new_options})
+
+            self._theme_priority = priority
+            self._theme = theme
+            self._apply_theme(diff)
+
+        return True
 
     # todo save "_kw" and "_dont_edit" in the object that actually has the option (might require onscreenText to actually support themability directly)
-    def _apply_theme(self):
+    def _apply_theme(self, diff=False):
         theme = self._theme
         priority = self._theme_priority
         if theme is None:
@@ -278,6 +585,8 @@ class DirectGuiWidget(DirectGuiBase.DirectGuiWidget):
 
             elif key in self._dont_edit:  # some ancestor has already handled this value
                 self._dont_edit.remove(key)
+                if not self._dont_edit:
+                    self._dont_edit = self._nothing_handled
                 continue
 
             if "_" in key:  # the option is for some component
@@ -297,20 +606,81 @@ class DirectGuiWidget(DirectGuiBase.DirectGuiWidget):
                     #     value = comp._kw[option_name]
                     if hasattr(comp, "_dont_edit"):  # OnscreenText/Image/Geom does not have that
                         # this makes sure thumb_frameColor takes precedence over frameColor in a theme
+                        if comp._dont_edit is comp._nothing_handled:
+                            comp._dont_edit = set()
                         comp._dont_edit.add(option_name)  # make sure the component doesn't override the value just set
 
+            if diff and self._has_option_value(key, value):  # nothing would change
+                continue
+
             self.configure(**{key: value})
 
             # make sure to also update the widget if a component has been updated
             self._update_parent(key, value)
 
-        children = GuiUtil.get_gui_children(self)
-        for child in children:  # propagate the theme to the children
-            child.set_theme(theme, priority)
+    def _is_hidden_for_theming(self) -> bool:
+        """Is self hidden or stashed itself (not only because of some ancestor)?"""
+        return self.node().isOverallHidden() or self.getStashedAncestor() == self
 
-    def _get_theme_options(self, theme: dict[str: Any]):
-        name = type(self).__name__
-        parent_class = type(self).__base__.__name__
+    def _apply_pending_theme(self):
+        """Set the theme that was set while self was hidden, even if self is still hidden."""
+        if self._pending_theme is None:
+            return
+
+        theme, priority, clear_old_theme, diff = self._pending_theme
+        self._pending_theme = None
+        self._propagate_theme([self], theme, priority, clear_old_theme, diff, force=True)
+
+    def _has_option_value(self, key: str, value: Any) -> bool:
+        """Check if the option 'key' is already set to 'value'."""
+        try:
+            return bool(self[key] == value)
+        except Exception:  # the option can't be read or compared, assume it differs
+            return False
+
+    @classmethod
+    def invalidate_theme_cache(cls, theme: dict | None = None):
+        """Forget the resolved options of 'theme', or of all themes if 'theme' is None.
+        Only needed if a theme is edited in place without being set again.
+        ThemeUtil.Theme:s can't be edited, so their options are kept."""
+        if theme is None:
+            DirectGuiWidget._theme_cache.clear()
+        elif not isinstance(theme, ThemeUtil.Theme):
+            DirectGuiWidget._theme_cache.pop(id(theme), None)
+
+    @classmethod
+    def add_resolved_theme_options(cls, theme: dict[str: Any], resolved: dict[type, Mapping[str, Any]]):
+        """Store options of 'theme' that have already been resolved per widget class (like by a theme file cache),
+        so they don't have to be resolved again."""
+        cache_entry = cls._get_theme_cache_entry(theme)
+        for widget_class, options in resolved.items():
+            cache_entry[widget_class] = MappingProxyType(dict(options))
+
+    @classmethod
+    def _get_theme_cache_entry(cls, theme: dict[str: Any]) -> dict[type, Mapping[str, Any]]:
+        cache = DirectGuiWidget._theme_cache
+        key = theme if isinstance(theme, ThemeUtil.Theme) else id(theme)
+        entry = cache.get(key)
+        if entry is None or key is not theme and entry[0] is not theme:  # a new theme (or one that reuses the id of an old one)
+            if len(cache) >= cls._theme_cache_size:
+                del cache[next(iter(cache))]  # drop the oldest theme
+            entry = cache[key] = (theme, {})
+        return entry[1]
+
+    def _get_theme_options(self, theme: dict[str: Any]) -> Mapping[str, Any]:
+        """Get the options of 'theme' that apply to self.
+        They are resolved once per widget class and theme, the returned mapping is read-only."""
+        resolved = self._get_theme_cache_entry(theme)
+        widget_class = type(self)
+        if widget_class not in resolved:
+            resolved[widget_class] = MappingProxyType(self._resolve_theme_options(theme))
+
+        return resolved[widget_class]
+
+    @classmethod
+    def _resolve_theme_options(cls, theme: dict[str: Any]) -> dict[str: Any]:
+        name = cls.__name__
+        parent_class = cls.__base__.__name__
         gui_theme = {}
 
         # start with general options, the specific theme for this element overrides values from the general theme
@@ -330,12 +700,146 @@ class DirectGuiWidget(DirectGuiBase.DirectGuiWidget):
         return gui_theme
 
     def __setitem__(self, key, value):
+        if self._batched_options is not None:  # set when the batch block exits
+            self._batched_options[key] = value
+            return
+
         super().__setitem__(key, value)
 
         # make sure to update element if a component has changed
         self._update_parent(key, value)
 
-        self._kw[key] = value  # keep track of the options set directly by the user, used for themability
+        self._remember_user_option(key, value)  # keep track of the options set directly by the user, used for themability
+
+    @contextmanager
+    def batch(self):
+        """Context manager to change several options at once.
+        Options set on self inside the block (self[key] = value) are applied together when the block exits,
+        so reading them inside the block still returns the old values.
+        The frames of self and of any other widget changed in the block (like the components of self)
+        are only updated once, when the block exits.
+
+            with slider.batch():
+                slider["text"] = "volume"
+                slider["pad"] = (0.1, 0.1)
+                slider["thumb_frameSize"] = (-0.1, 0.1, -0.2, 0.2)
+        """
+        if self._batched_options is not None:  # already in a batch block
+            yield self
+            return
+
+        self._batched_options = {}
+        try:
+            with self._deferred_frame_updates():
+                yield self
+                options = self._batched_options
+                self._batched_options = None
+                self.update_options(**options)
+        finally:
+            self._batched_options = None
+
+    def update_options(self, **kw):
+        """Set several options at once, the frame of self is only updated once.
+        Each option is configured only once, even if it affects a component."""
+        if self._batched_options is not None:
+            self._batched_options.update(kw)
+            return
+
+        with self._deferred_frame_updates():
+            self.configure(**kw)
+            for key, value in kw.items():
+                self._update_parent(key, value)
+                self._remember_user_option(key, value)  # same as in __setitem__
+
+    def _remember_user_option(self, key: str, value: Any):
+        if self._kw is self._no_user_options:
+            self._kw = {}
+        self._kw[key] = value
+
+    def configure(self, option=None, **kw):
+        for key, value in kw.items():
+            if type(value) is MappingProxyType:  # a shared default (like from get_default), copied when changed
+                kw[key] = CopyOnWriteDict(value)
+        result = super().configure(option, **kw)
+        if "sortOrder" in kw and not self.isEmpty():  # changes the order of self in the children of the parent
+            self._clear_parent_caches()
+        if self._observers is not None:
+            for key in kw:
+                self._option_changed(key)
+        return result
+
+    def observe(self, option: str, callback: Callable[[Any], None]):
+        """Call 'callback' with the new value of 'option' when the option is changed.
+        The changes are collected and the callbacks are called once per frame, by a task in the gui controller,
+        with the latest value. So changing the option many times in one frame (like when dragging a slider)
+        only calls 'callback' once.
+        Options of a component (like "thumb_frameColor") are observed on the component,
+        so changing the option on the component directly also calls 'callback'.
+
+            slider.observe("value", lambda value: print("volume", value))
+        """
+        widget, option = self._get_observed_widget(option)
+        if widget is not self:
+            widget.observe(option, callback)
+            return
+
+        if "_" not in option and option not in self._optionInfo:
+            raise KeyError(f'Unknown option "{option}" for {type(self).__name__}')
+
+        if self._observers is None:
+            self._observers = {}
+        if option not in self._observers:
+            self._observers[option] = []
+            self._start_observing(option)
+        self._observers[option].append(callback)
+
+    def unobserve(self, option: str, callback: Callable[[Any], None]):
+        """Stop calling 'callback' when 'option' is changed, see 'observe'."""
+        widget, option = self._get_observed_widget(option)
+        if widget is not self:
+            widget.unobserve(option, callback)
+            return
+
+        if self._observers is None or callback not in self._observers.get(option, ()):
+            raise ValueError(f"{callback} does not observe {option} of {self}")
+        self._observers[option].remove(callback)
+        if not self._observers[option]:
+            del self._observers[option]
+
+    def _get_observed_widget(self, option: str) -> tuple[DirectGuiWidget, str]:
+        """Get the widget that has 'option', and the name of the option in that widget.
+        That is a component of self for options like "thumb_frameColor",
+        unless the component is not a DirectGuiWidget (like the OnscreenText in "text_fg")."""
+        index = option.find("_")
+        if index != -1 and self.hascomponent(option[:index]):
+            component = self.component(option[:index])
+            if isinstance(component, DirectGuiWidget):
+                return component, option[index + 1:]
+        return self, option
+
+    def _start_observing(self, option: str):
+        """Called when the first callback observes 'option'.
+        Override to notify the observers of options that change without being configured."""
+        pass
+
+    def _get_observed_value(self, option: str) -> Any:
+        """The value passed to the observers of 'option'."""
+        try:
+            return self[option]
+        except KeyError:
+            if "_" not in option:
+                raise
+            # the option is for a group of components, like "text_fg", use the first component ("text0")
+            index = option.find("_")
+            component = option[:index] + "0"
+            if not self.hascomponent(component):  # the group is empty, like "text" for a widget without text
+                return None
+            return self.component(component)[option[index + 1:]]
+
+    def _option_changed(self, option: str):
+        """Let the observers of 'option' know that it has changed, they are called at the end of the frame."""
+        if self._observers is not None and option in self._observers:
+            base.gui_controller._queue_option_change(self, option)
 
     def _update_parent(self, key, value):
         if not base.gui_controller.do_bug_fixes:
@@ -348,23 +852,44 @@ class DirectGuiWidget(DirectGuiBase.DirectGuiWidget):
 
         # make sure to update the widget if a component has been updated
         if "_" in key and self._comp_update_func is not None:
-            self._comp_update_func(**{key: value})
+            self._queue_comp_update(**{key: value})
 
-        # if self is a component: update the parent widget
-        parent = GuiUtil.get_parent(self)
-        parent = GuiUtil.get_gui(parent)
-        if parent is not None:
-            for comp in parent.components():
-                if self is parent.component(comp):
-                    parent._comp_update_func(**{key: value})
+        # if self is a component of its parent widget: update the parent widget
+        owner = self._component_owner
+        if owner is None or not hasattr(owner, "_optionInfo"):  # not a component, or the owner has been destroyed
+            return
+        if GuiUtil.get_parent(self) == owner and owner.hascomponent(self._component_name) \
+                and owner.component(self._component_name) is self:
+            owner._queue_comp_update(**{key: value})
 
     def clear_theme(self):
         """Remove the theming options from this element and its children."""
+        self._clear_theme()
+
+    @staticmethod
+    def _propagate_clear_theme(widgets: list[DirectGuiWidget]):
+        """Clear the theme of widgets and their gui descendants, in a single pass over the scene-graph.
+        The descendants of a widget without a theme are skipped."""
+        stack = list(reversed(widgets))
+        with DirectGuiWidget._deferred_frame_updates():
+            while stack:
+                widget = stack.pop()
+                if widget._clear_theme(propagate=False):
+                    GuiUtil.add_gui_children(widget, stack)
+
+    def _clear_theme(self, propagate=True) -> bool:
+        """Clear the theme of self, and of its children if 'propagate' is True.
+        Returns False if self had no theme."""
+        if propagate:
+            had_theme = self._theme is not None
+            self._propagate_clear_theme([self])
+            return had_theme
+
+        self._pending_theme = None
         if self._theme is None:
-            return
+            return False
 
         name = type(self).__name__
-        options = {option[0]: option[1] for option in self.options()}  # dict with name and default value for options of self
         theme = {}
         if name in self._theme:
             theme = self._theme[name]
@@ -373,6 +898,15 @@ class DirectGuiWidget(DirectGuiBase.DirectGuiWidget):
             gen_theme.update(theme)
             theme = gen_theme
 
+        self._reset_theme_options(theme)
+
+        self._theme_priority = -1
+        self._theme = None
+        return True
+
+    def _reset_theme_options(self, theme: Mapping[str, Any]):
+        """Reset the options in 'theme' to their default values, unless they have been set by the user."""
+        options = {option[0]: option[1] for option in self.options()}  # dict with name and default value for options of self
         for key in theme:
             if "_" in key:  # this option is for a component of self
                 index = key.rfind("_")
@@ -401,13 +935,6 @@ class DirectGuiWidget(DirectGuiBase.DirectGuiWidget):
                     default = options[key]
                     self.configure(**{key: default})
 
-        self._theme_priority = -1
-        self._theme = None
-
-        children = GuiUtil.get_gui_children(self)
-        for child in children:  # clear the theme for the children
-            child.clear_theme()
-
     def add_theming_options(self, kw: dict, parent: DirectGuiWidget | None, myClass):
         """Merge kw with the theming specified in guiController. Only to be used during initialization.
 
@@ -418,7 +945,7 @@ class DirectGuiWidget(DirectGuiBase.DirectGuiWidget):
         if self.__class__ is not myClass:
             return
 
-        self._kw = kw.copy()
+        self._kw = kw.copy() if kw else self._no_user_options
 
         if not base.gui_controller.do_theming:
             return
@@ -434,7 +961,10 @@ class DirectGuiWidget(DirectGuiBase.DirectGuiWidget):
             self._theme = themes
             self._theme_priority = base.gui_controller.gui_theme_priority
 
-        self._apply_theme()
+        with self._deferred_frame_updates():
+            self._apply_theme()
+            if self._theme is not None:
+                self._propagate_theme(GuiUtil.get_gui_children(self, include_stashed=True), self._theme, self._theme_priority)
 
     def get_default(self, option_name: str) -> Any:
         """Get the default value of the option.
@@ -442,14 +972,46 @@ class DirectGuiWidget(DirectGuiBase.DirectGuiWidget):
         config = self._optionInfo[option_name]
         return config[DGG._OPT_DEFAULT]
 
-    def copy(self):  # todo make sure components options are also updated (there might be options saved in comp._kw)
-        """Creates a copy of self with the same options set and the same theme."""
-        new_widget = type(self)(**self._kw)
-        if new_widget._theme != self._theme:
-            new_widget.set_theme(self._theme, self._theme_priority)
+    def copy(self):
+        """Creates a copy of self with the same options set and the same theme.
+        The copy is constructed from the options of self, then the options set directly on the components of self
+        (like slider.thumb["frameColor"]) are set on the components of the copy.
+        If the copy would get another theme from the gui controller than the theme of self,
+        the copy is created without a theme and the theme of self is applied once,
+        instead of applying the theme from the gui controller first and then replacing it."""
+        controller = base.gui_controller
+        name = type(self).__name__
+        if controller.gui_themes is not None and name in controller.gui_themes:
+            theme, priority = controller.gui_themes, controller.gui_theme_priority
+        else:
+            theme, priority = None, -1
 
+        if self._theme is None or self._theme_priority <= priority or self._theme == theme:
+            new_widget = type(self)(**self._kw)  # the copy gets the same theme as self (or keeps the one from the controller)
+        else:
+            with controller._theming_disabled():
+                new_widget = type(self)(**self._kw)
+            new_widget._propagate_theme([new_widget], self._theme, self._theme_priority)
+
+        self._copy_component_options(new_widget)
         return new_widget
 
+    def _copy_component_options(self, new_widget: DirectGuiWidget):
+        """Set the options saved in the '_kw' of the components of self (and their components) on the components
+        of new_widget, if they are still set on self and differ. Callbacks are skipped, since they might be bound to self."""
+        for name in self.components():
+            component = self.component(name)
+            if not isinstance(component, DirectGuiWidget) or not new_widget.hascomponent(name):
+                continue
+
+            new_component = new_widget.component(name)
+            options = {key: value for key, value in component._kw.items()
+                       if not callable(value) and component._has_option_value(key, value)  # not outdated
+                       and not new_component._has_option_value(key, value)}
+            if options:
+                new_component.update_options(**options)
+            component._copy_component_options(new_component)
+
     def bind(self, event, command, extraArgs=[]):
         """Bind the command (which should expect one arg) to the specified
         event (such as ENTER, EXIT, B1PRESS, B1CLICK, etc.)
@@ -540,8 +1102,7 @@ class DirectGuiWidget(DirectGuiBase.DirectGuiWidget):
         :param direction: The direction to alter.
         :param next_item: The element to select when navigating in that direction.
         """
-        nav_map = self["navigationMap"]
-        nav_map[direction] = next_item
+        self["navigationMap"][direction] = next_item
         opposite_direction = base.gui_controller.get_opposite_direction(direction)
         next_item["navigationMap"][opposite_direction] = self
 
@@ -5,8 +5,13 @@ from direct.showbase.DirectObject import DirectObject
 import panda3d.core as p3d
 from BetterDirectGui import DirectGuiBase
 from BetterDirectGui.GuiTools import GuiUtil
+from BetterDirectGui.GuiTools.SpatialIndex import WidgetIndex
 
+from collections import deque
 from collections.abc import Iterable, Callable
+from contextlib import contextmanager
+from functools import partial
+import time
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
@@ -16,6 +21,85 @@ if TYPE_CHECKING:
 __all__ = ["GuiController"]
 
 
+class _ThemeJob:
+    """A theme that is applied to the widgets one at a time, spread out over several frames.
+    Visible widgets are themed first, and a widget is always themed before its children."""
+
+    def __init__(self, widgets: list[DirectGuiBase.DirectGuiWidget], theme: dict, priority: int, diff: bool,
+                 frame_budget: float):
+        self.theme = theme
+        self.priority = priority
+        self.diff = diff
+        self.frame_budget = frame_budget
+        self.future = p3d.AsyncFuture()
+        self.themed = 0  # number of widgets handled so far
+        self._visible = deque()
+        self._hidden = deque()
+        self._add(widgets)
+
+    def _add(self, widgets: list[DirectGuiBase.DirectGuiWidget]):
+        for widget in widgets:
+            if widget.isHidden():  # the children of a hidden widget are hidden as well
+                self._hidden.append(widget)
+            else:
+                self._visible.append(widget)
+
+    @property
+    def remaining(self) -> int:
+        """The number of widgets waiting to be themed, their children are not included."""
+        return len(self._visible) + len(self._hidden)
+
+    def step(self) -> bool:
+        """Theme the next widget. Returns False if there is nothing left to theme."""
+        queue = self._visible or self._hidden
+        if not queue:
+            return False
+
+        widget = queue.popleft()
+        self.themed += 1
+        if not hasattr(widget, "_optionInfo"):  # the widget was destroyed while waiting
+            return True
+
+        if widget._set_theme(self.theme, self.priority, diff=self.diff):
+            self._add(GuiUtil.get_gui_children(widget, include_stashed=True))
+
+        return True
+
+
+class _TabOrder:
+    """The widgets under a node in the order that tab visits them: depth first, with the children of each widget
+    in the order of GuiUtil.get_gui_children. Stores the next and previous selectable widget for each widget,
+    so moving with tab and shift-tab is a lookup."""
+
+    def __init__(self, base_np: p3d.NodePath, respect_sort_order: bool):
+        self.respect_sort_order = respect_sort_order
+        guis = []
+        stack = GuiUtil.get_gui_children(base_np)[::-1]
+        while stack:
+            gui = stack.pop()
+            guis.append(gui)
+            stack.extend(GuiUtil.get_gui_children(gui)[::-1])
+        is_selectable = [GuiUtil.is_selectable_gui(gui) for gui in guis]
+        selectable = [gui for gui, flag in zip(guis, is_selectable) if flag]
+
+        # the first/last selectable widget, used when nothing is selected and to wrap around at the ends
+        self.first = selectable[0] if selectable else None
+        self.last = selectable[-1] if selectable else None
+        self.next: dict[DirectGuiBase.DirectGuiWidget, DirectGuiBase.DirectGuiWidget] = {}
+        self.previous: dict[DirectGuiBase.DirectGuiWidget, DirectGuiBase.DirectGuiWidget] = {}
+
+        following = self.first
+        for gui, flag in zip(reversed(guis), reversed(is_selectable)):
+            self.next[gui] = following
+            if flag:
+                following = gui
+        preceding = self.last
+        for gui, flag in zip(guis, is_selectable):
+            self.previous[gui] = preceding
+            if flag:
+                preceding = gui
+
+
 class GuiController(DirectObject):
     """Class for handling the added gui functionality.
 
@@ -26,18 +110,30 @@ class GuiController(DirectObject):
     :param theme: The global theme used by all elements that are children of base_np.
     :param do_keyboard_navigation: Chose weather keyboard navigation is enabled.
     :param no_initopts: Bool for making all initopts editable after gui creation.
+    :param spatial_navigation: If True: the arrow keys move to the closest selectable element on screen
+     in the direction of the key, instead of moving in the node-graph.
+    :param lazy_theming: If True: hidden and stashed elements are themed when they are shown again,
+     instead of when the theme is set.
     """
 
     gui_themes = None  # By default, no theme
     gui_theme_priority = -1
 
+    # Sent every frame while a theme is applied over several frames,
+    # with the number of widgets themed so far and the number of widgets waiting.
+    theme_progress_event = "gui-theme-progress"
+    # Sent with the theme when it has been applied to all widgets.
+    theme_applied_event = "gui-theme-applied"
+
     def __init__(self, base_np: p3d.NodePath = None,
                  respect_sortOrder=False,
                  do_bug_fixes=True,
                  theme=None,
                  do_keyboard_navigation=True,
                  no_initopts=True,
-                 default_option_menu=False):
+                 default_option_menu=False,
+                 spatial_navigation=False,
+                 lazy_theming=True):
         super().__init__()
         base.gui_controller = self
         self._respect_sortOrder = respect_sortOrder
@@ -46,9 +142,17 @@ class GuiController(DirectObject):
         self._default_option_menu = default_option_menu
         self._do_theming = True
         self._no_initopts = no_initopts
+        self._lazy_theming = lazy_theming
         if base_np is None:
             base_np = base.aspect2d
         self._base_np = base_np
+        # the root of the innermost focus scope (see push_focus_scope), navigation doesn't leave it
+        self._navigation_root = base_np
+        # for each pushed focus scope: its root and the selection from before it was pushed
+        self._focus_scopes: list[tuple[p3d.NodePath, DirectGuiBase.DirectGuiWidget | None]] = []
+        self._theme_jobs: deque[_ThemeJob] = deque()  # themes being applied over several frames
+        # observed options that have changed this frame, see DirectGuiWidget.observe
+        self._changed_options: dict[tuple[DirectGuiBase.DirectGuiWidget, str], None] = {}
         if theme is not None:
             self.set_theme(theme)
 
@@ -57,6 +161,10 @@ class GuiController(DirectObject):
 
         self._current_selection: DirectGuiBase.DirectGuiWidget | None = None
         self._current_pos: DirectGuiBase.DirectGuiWidget | None = None
+        # order used by tab/shift-tab, None when widgets have changed since it was found (see _get_tab_order)
+        self._tab_order: _TabOrder | None = None
+        self._spatial_index: WidgetIndex | None = None  # created when first used
+        self._scope_index: WidgetIndex | None = None  # index of the innermost focus scope, for spatial navigation
 
         self._key_map = {
             "u": ("arrow_up", self._parent_selectable_gui),  # 'up' move upward (by default upwards in the node-graph)
@@ -69,6 +177,9 @@ class GuiController(DirectObject):
             "f": ("tab", self._next_selectable_gui),  # 'forward' move to next item (to next gui node in the node-graph)
             "b": ("shift-tab", self._previous_selectable_gui)  # 'backward' inverse of 'forward' (backward in the node-graph)
         }
+        self._spatial_navigation = False
+        if spatial_navigation:
+            self.spatial_navigation = True
         self._activation_key = "enter"
         self._unhighlight_key = "mouse3"
         self._do_keyboard_navigation = do_keyboard_navigation
@@ -83,31 +194,119 @@ class GuiController(DirectObject):
 
         self.highlight_color = (0.7, 0.7, 0.7, 1)
 
-    def set_theme(self, theme: dict, priority: int = 0):
+    def set_theme(self, theme: dict, priority: int = 0, diff=False,
+                  frame_budget: float | None = None) -> p3d.AsyncFuture | None:
         """Set the global theme. Theme is set for all DirectGui objects that are children of 'self.base_np'.
 
         :param theme: The new theme to set.
         :param priority: Priority value to override previous theme.
+        :param diff: Only reconfigure the options that differ between the old and the new theme.
+         Makes switching between two similar themes a lot cheaper.
+        :param frame_budget: If specified, the theme is applied over several frames,
+         spending roughly this many milliseconds per frame. Visible widgets are themed first.
+        :return: If 'frame_budget' is specified, a future that can be awaited and is done when all widgets are themed.
         """
         self.gui_themes = theme
         self.gui_theme_priority = priority
-        children = GuiUtil.get_gui_children(self._base_np)
-        for child in children:
-            child.set_theme(theme, priority)
+        DirectGuiBase.DirectGuiWidget.invalidate_theme_cache(theme)
+        children = GuiUtil.get_gui_children(self._base_np, include_stashed=True)
+        if frame_budget is not None:
+            job = _ThemeJob(children, theme, priority, diff, frame_budget)
+            if not self._theme_jobs:
+                self.addTask(self._theme_task, "gui-theme")
+            self._theme_jobs.append(job)  # is started when the themes set before it are done
+            return job.future
+
+        self.finish_theme()  # make sure the themes set before this one are done
+        DirectGuiBase.DirectGuiWidget._propagate_theme(children, theme, priority, diff=diff)
+
+        return None
 
     def clear_theme(self):
         """Clear the global theme."""
+        self.finish_theme()
         self.gui_themes = None
         self.gui_theme_priority = -1
-        children = GuiUtil.get_gui_children(self._base_np)
-        for child in children:
-            child.clear_theme()
+        children = GuiUtil.get_gui_children(self._base_np, include_stashed=True)
+        DirectGuiBase.DirectGuiWidget._propagate_clear_theme(children)
+
+    @property
+    def theme_pending(self) -> bool:
+        """True while some theme is being applied over several frames."""
+        return bool(self._theme_jobs)
+
+    def finish_theme(self):
+        """Immediately finish applying the themes that are being applied over several frames."""
+        if not self._theme_jobs:
+            return
+
+        self.removeTask("gui-theme")
+        with DirectGuiBase.DirectGuiWidget._deferred_frame_updates():
+            while self._theme_jobs:
+                job = self._theme_jobs[0]
+                while job.step():
+                    pass
+                self._finish_theme_job()
+
+    def _finish_theme_job(self):
+        job = self._theme_jobs.popleft()
+        job.future.set_result(job.theme)
+        base.messenger.send(self.theme_applied_event, [job.theme])
+
+    def _theme_task(self, task):
+        job = self._theme_jobs[0]
+        end_time = time.perf_counter() + job.frame_budget / 1000
+        # the widgets are updated when leaving the block, so they are all consistent at the end of the frame
+        with DirectGuiBase.DirectGuiWidget._deferred_frame_updates():
+            while job.step():
+                if time.perf_counter() >= end_time:
+                    break
+            else:
+                self._finish_theme_job()
+
+        if self._theme_jobs:
+            job = self._theme_jobs[0]
+            base.messenger.send(self.theme_progress_event, [job.themed, job.remaining])
+            return task.cont
+
+        return task.done
+
+    def _queue_option_change(self, widget: DirectGuiBase.DirectGuiWidget, option: str):
+        """Call the observers of 'option' in 'widget' when the frame ends. Several changes give a single call."""
+        if not self._changed_options:
+            # after the events of the frame have been handled, but before the frame is rendered
+            self.addTask(self._observer_task, "gui-observers", sort=40)
+        self._changed_options[(widget, option)] = None
+
+    def _observer_task(self, task):
+        changed = self._changed_options
+        # options changed by the callbacks are reported in the next frame
+        self._changed_options = {}
+        for widget, option in changed:
+            observers = widget._observers
+            if not hasattr(widget, "_optionInfo") or not observers or option not in observers:
+                continue  # the widget has been destroyed, or there are no observers left
+            value = widget._get_observed_value(option)
+            for callback in list(observers[option]):
+                callback(value)
+
+        return task.done
 
     @property
     def do_theming(self):
         """Is themeability turned on?"""
         return self._do_theming
 
+    @contextmanager
+    def _theming_disabled(self):
+        """Widgets created inside the block get no theme."""
+        do_theming = self._do_theming
+        self._do_theming = False
+        try:
+            yield
+        finally:
+            self._do_theming = do_theming
+
     @property
     def default_option_menu(self):
         """Does DirectOptionMenus have their default appearance?"""
@@ -136,6 +335,35 @@ class GuiController(DirectObject):
             else:
                 print(f"warning: '{arg}' is not an defined direction for keyboard navigation")
 
+    @property
+    def spatial_navigation(self):
+        """If True: the arrow keys move to the closest selectable element on screen in the direction of the key,
+        instead of moving in the node-graph.
+        """
+        return self._spatial_navigation
+
+    @spatial_navigation.setter
+    def spatial_navigation(self, value: bool):
+        self._spatial_navigation = value
+        if value:
+            functions = {direction: partial(self._spatial_selectable_gui, direction) for direction in "udlr"}
+        else:
+            functions = {"u": self._parent_selectable_gui, "d": self._child_selectable_gui,
+                         "l": self._move_previous_current_level, "r": self._move_next_current_level}
+        for direction, function in functions.items():
+            option = self._key_map[direction]
+            if isinstance(option, tuple):  # the function is looked up when the key is pressed, no need to rebind
+                self._key_map[direction] = (option[0], function)
+
+    @property
+    def spatial_index(self) -> WidgetIndex:
+        """Index of the frames of all (visible) widgets under base_np, in the coordinates of base_np.
+        Used to find the widgets at or near some point or rectangle, see 'WidgetIndex'.
+        """
+        if self._spatial_index is None:
+            self._spatial_index = WidgetIndex(self._base_np)
+        return self._spatial_index
+
     @property
     def respect_sortOrder(self):
         """If True: navigation will take into account the sort order of the gui elements
@@ -153,6 +381,12 @@ class GuiController(DirectObject):
         """The base nodepath for keyboard navigation and global theming. By default, it is aspect2d."""
         return self._base_np
 
+    @property
+    def navigation_root(self):
+        """The nodepath that keyboard navigation is confined to:
+        the root of the innermost focus scope (see 'push_focus_scope'), or else base_np."""
+        return self._navigation_root
+
     @property
     def do_keyboard_navigation(self):
         """Bool for if keyboard navigation is enabled."""
@@ -163,6 +397,11 @@ class GuiController(DirectObject):
         """Bool for making all initopts editable after gui creation."""
         return self._no_initopts
 
+    @property
+    def lazy_theming(self):
+        """If True: hidden and stashed elements are themed when they are shown again."""
+        return self._lazy_theming
+
     def get_opposite_direction(self, direction: str) -> str:
         """Get the opposite direction to the direction specified.
         For example "f" returns "b" and "u" would return "d".
@@ -203,6 +442,61 @@ class GuiController(DirectObject):
 
         self.activate_keys()
 
+    def push_focus_scope(self, root: p3d.NodePath):
+        """Confine keyboard navigation to the widgets below 'root' (like a dialog), until the scope is popped.
+        The selection is cleared, and selected again when the scope is popped.
+        Pushing a scope that is already active, or whose root is hidden, does nothing.
+        """
+        if root.isHidden() or any(scope_root == root for scope_root, _ in self._focus_scopes):
+            return
+
+        self._focus_scopes.append((root, self._current_selection))
+        self._set_navigation_root(root)
+        self.current_selection = None
+
+    def pop_focus_scope(self, root: p3d.NodePath = None):
+        """Leave the focus scope of 'root' (by default the innermost scope), and the scopes pushed after it
+        on nodes below 'root' (like the popup of an option menu in a dialog). Popping a scope that isn't active does nothing.
+        If the innermost scope is left, navigation goes back to the previous scope, and the widget that was selected
+        before 'root' was pushed is selected again (if it is still in the previous scope).
+        Otherwise, the other scopes pushed after 'root' stay active and the selection doesn't change.
+        """
+        scopes = self._focus_scopes
+        for index in range(len(scopes) - 1, -1, -1):
+            if root is None or scopes[index][0] == root:
+                break
+        else:
+            return
+
+        scope_root, previous_selection = scopes[index]
+        left = [i for i in range(index, len(scopes)) if i == index or scope_root.isAncestorOf(scopes[i][0])]
+        left_innermost = left[-1] == len(scopes) - 1
+        selection = scopes[-1][1]
+        for i in reversed(left):
+            del scopes[i]
+
+        # the remaining scopes return to where 'root' would have returned to, instead of to a widget below it
+        for i in range(index, len(scopes)):
+            next_root, next_selection = scopes[i]
+            if next_selection is not None and not next_selection.isEmpty() and scope_root.isAncestorOf(next_selection):
+                scopes[i] = (next_root, previous_selection)
+        if not left_innermost:
+            return
+
+        self._set_navigation_root(scopes[-1][0] if scopes else self._base_np)
+
+        if index == len(scopes) or (selection is not None and not selection.isEmpty() and
+                                    scope_root.isAncestorOf(selection)):
+            selection = previous_selection  # every scope pushed since 'root' was left, or it returned below 'root'
+        if selection is not None and (selection.isEmpty() or not self._navigation_root.isAncestorOf(selection)):
+            selection = None  # destroyed or moved out of the scope
+        self.current_selection = selection
+
+    def _set_navigation_root(self, root: p3d.NodePath):
+        self._navigation_root = root
+        self._scope_index = None
+        self._invalidate_tab_order()
+
     def update_activation_key(self, key: str, include_repeat_event=True):
         """Used to set the key to press to activate the currently selected gui element.
 
@@ -355,7 +649,7 @@ class GuiController(DirectObject):
 
         if parent is None:
             if self.current_selection is None:
-                parent = self._base_np
+                parent = self._navigation_root
             else:
                 parent = GuiUtil.get_parent(self.current_selection)
 
@@ -370,7 +664,7 @@ class GuiController(DirectObject):
                     next_item = self._get_next_on_level(child)
 
                 elif index + 1 >= len(children):
-                    if parent == self._base_np:
+                    if parent == self._navigation_root:
                         next_item = children[0]
                     else:
                         return None
@@ -387,7 +681,7 @@ class GuiController(DirectObject):
 
         if parent is None:
             if self.current_selection is None:
-                parent = self._base_np
+                parent = self._navigation_root
             else:
                 parent = GuiUtil.get_parent(self.current_selection)
 
@@ -399,7 +693,7 @@ class GuiController(DirectObject):
         for index, child in enumerate(children):
             if child == self.current_selection:
                 if index == 0:
-                    if parent == self._base_np:
+                    if parent == self._navigation_root:
                         # next_item = children[-1]
                         self.current_selection = None
                         next_item = self._get_previous_on_level()
@@ -420,7 +714,64 @@ class GuiController(DirectObject):
 
         return GuiUtil.get_gui(next_item)
 
+    def _get_tab_order(self) -> _TabOrder:
+        if self._tab_order is None or self._tab_order.respect_sort_order != self._respect_sortOrder:
+            self._tab_order = _TabOrder(self._navigation_root, self._respect_sortOrder)
+        return self._tab_order
+
+    def _invalidate_tab_order(self):
+        """Called by the widgets when they are added, removed or changed in a way that can change the tab order."""
+        self._tab_order = None
+
     def _next_selectable_gui(self):
+        tab_order = self._get_tab_order()
+        if self.current_selection is None:
+            next_item = tab_order.first
+        else:
+            next_item = tab_order.next.get(self.current_selection)
+
+        if next_item is None:  # current_selection is not under the navigation root (or stashed), or nothing is selectable
+            self._search_next_selectable_gui()
+        else:
+            self.current_selection = next_item
+
+    def _previous_selectable_gui(self):
+        tab_order = self._get_tab_order()
+        if self.current_selection is None:
+            next_item = tab_order.last
+        else:
+            next_item = tab_order.previous.get(self.current_selection)
+
+        if next_item is None:
+            self._search_previous_selectable_gui()
+        else:
+            self.current_selection = next_item
+
+    def _get_navigation_index(self) -> WidgetIndex:
+        if self._navigation_root == self._base_np:
+            return self.spatial_index
+        if self._scope_index is None:
+            self._scope_index = WidgetIndex(self._navigation_root)
+        return self._scope_index
+
+    def _spatial_selectable_gui(self, direction: str):
+        """Select the selectable gui closest to the current selection in 'direction' ("u", "d", "l" or "r")."""
+        if self.current_selection is None:
+            self.current_selection = self._get_tab_order().first
+            return
+
+        index = self._get_navigation_index()
+        previous = self.current_selection
+        rect = GuiUtil.get_frame_rect(previous, self._navigation_root)
+        next_item = index.nearest_in_direction(rect, direction, exclude=previous, accept=GuiUtil.is_selectable_gui)
+        if next_item is not None:
+            self.current_selection = next_item
+            # highlighting changes the bounds of the nodes above the widgets, but doesn't move anything
+            index._retake_bounds(previous)
+            index._retake_bounds(next_item)
+
+    def _search_next_selectable_gui(self):
+        """Find the next selectable gui by walking the scene-graph from current_selection."""
         next_item = self._get_next_on_level()
         if next_item is None and self.current_selection is None:
             return
@@ -450,7 +801,8 @@ class GuiController(DirectObject):
 
         self.current_selection = next_item
 
-    def _previous_selectable_gui(self):
+    def _search_previous_selectable_gui(self):
+        """Find the previous selectable gui by walking the scene-graph from current_selection."""
         next_item = self._get_previous_on_level()
         if next_item is None and self.current_selection is None:
             return
@@ -474,7 +826,7 @@ class GuiController(DirectObject):
 
     def _move_next_current_level(self):
         if self.current_selection is None:
-            next_item = GuiUtil.get_selectable_gui_children(self._base_np)
+            next_item = GuiUtil.get_selectable_gui_children(self._navigation_root)
             if next_item:
                 next_item = next_item[0]
             else:
@@ -490,7 +842,7 @@ class GuiController(DirectObject):
         if children:
             next_item = children[0]
         else:  # sometimes there are no valid children, start from base np instead
-            children = GuiUtil.get_selectable_gui_children(self._base_np)
+            children = GuiUtil.get_selectable_gui_children(self._navigation_root)
             next_item = children[0]
         for index, child in enumerate(children):
             if child == self.current_selection:
@@ -503,7 +855,7 @@ class GuiController(DirectObject):
 
     def _move_previous_current_level(self):
         if self.current_selection is None:
-            next_item = GuiUtil.get_selectable_gui_children(self._base_np)
+            next_item = GuiUtil.get_selectable_gui_children(self._navigation_root)
             if next_item:
                 next_item = next_item[-1]
             else:
@@ -519,7 +871,7 @@ class GuiController(DirectObject):
         if children:
             next_item = children[0]
         else:  # sometimes there are no valid children, start from base np instead
-            children = GuiUtil.get_selectable_gui_children(self._base_np)
+            children = GuiUtil.get_selectable_gui_children(self._navigation_root)
             next_item = children[0]
         for index, child in enumerate(children):
             if child == self.current_selection:
@@ -532,7 +884,7 @@ class GuiController(DirectObject):
             return
 
         parent = GuiUtil.get_parent(self.current_selection)
-        if parent == self._base_np:
+        if parent == self._navigation_root:
             return
 
         if GuiUtil.is_selectable_gui(parent):
@@ -553,7 +905,7 @@ class GuiController(DirectObject):
             if parent == og_parent:
                 parent = GuiUtil.get_parent(parent)
 
-            if parent == self._base_np:
+            if parent == self._navigation_root:
                 return
 
         else:  # no valid parent was found
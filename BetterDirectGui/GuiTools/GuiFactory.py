@@ -8,7 +8,7 @@ class GuiFactory:
 
     def __init__(self, gui_type, theme=None, **kwargs):
         self.gui_type = gui_type
-        self.theme = theme
+        self.theme = ThemeUtil.freeze(theme)
         self.kwargs = kwargs
 
     def __call__(self, parent=None, theme=None, **kwargs):
@@ -16,8 +16,8 @@ class GuiFactory:
         kw.update(kwargs)
         gui_item = self.gui_type(parent, **kw)
         priority = gui_item._theme_priority
-        theme_ = ThemeUtil.merge(self.theme, theme)
-        if theme_ != {}:
+        theme_ = ThemeUtil.merge(self.theme, theme)  # self.theme itself when theme is None, so it stays cached
+        if theme_:
             gui_item.set_theme(theme_, priority + 1)
 
         return gui_item
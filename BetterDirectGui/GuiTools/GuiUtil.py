@@ -4,6 +4,15 @@ from __future__ import annotations
 import panda3d.core as p3d
 from BetterDirectGui import DirectGuiBase
 
+# Python tag that stores the widget on the node of each widget (set when the widget is created, cleared when destroyed)
+widget_tag = "BetterDirectGui-widget"
+# Python tag with the number of [widgets, selectable widgets] below a node, see 'has_gui' and 'has_selectable_gui'.
+# Only nodes that have had widgets below them have the tag.
+counts_tag = "BetterDirectGui-counts"
+# Python tag with the lists returned by 'get_gui_children' and 'get_selectable_gui_children' for a node.
+# Cleared by the widgets when they are added to or removed from the node, or changed in a way that affects the lists.
+children_tag = "BetterDirectGui-children"
+
 
 def get_all_gui() -> dict[str: DirectGuiBase.DirectGuiWidget]:
     """Get a dict of all existing directGui widgets.
@@ -15,25 +24,30 @@ def get_all_gui() -> dict[str: DirectGuiBase.DirectGuiWidget]:
 def get_guiId(np: p3d.NodePath) -> str | None:
     """Get the 'guiId' of a node if it is a DirectGui widget,
     otherwise return 'None'."""
-    name = np.getName().split("-")
-    if len(name) < 2:
+    if (gui := get_gui(np)) is None:
         return None
 
-    return name[1]
+    return gui.guiId
 
 
 def get_gui(np: p3d.NodePath) -> DirectGuiBase.DirectGuiWidget | None:
     """Return the directGui object corresponding with the nodePath passed.
 
     If hte gui object does not exist 'None' is returned instead."""
-    guiId = get_guiId(np)
-    if guiId is None:
-        return None
+    gui = np.getPythonTag(widget_tag)
+    if gui is None and isinstance(np.node(), p3d.PGItem):  # might be a widget from direct.gui, that has no tag
+        return _get_gui_by_name(np)
 
-    if guiId in get_all_gui():
-        return get_all_gui()[guiId]
+    return gui
 
-    return None
+
+def _get_gui_by_name(np: p3d.NodePath) -> DirectGuiBase.DirectGuiWidget | None:
+    """Find the widget from the name of the node, which is '<class name>-<guiId>' for all DirectGui widgets."""
+    name = np.getName().split("-")
+    if len(name) < 2:
+        return None
+
+    return get_all_gui().get(name[1])
 
 
 def is_gui(np: p3d.NodePath | None) -> bool:
@@ -41,15 +55,7 @@ def is_gui(np: p3d.NodePath | None) -> bool:
     if np is None:
         return False
 
-    name = np.getName().split("-")
-    if len(name) < 2:
-        return False
-
-    name = name[1]
-    if name in get_all_gui():
-        return True
-
-    return False
+    return get_gui(np) is not None
 
 
 def is_selectable_gui(np: p3d.NodePath) -> bool:
@@ -70,86 +76,171 @@ def is_selectable_gui(np: p3d.NodePath) -> bool:
 
 
 def has_gui(np: p3d.NodePath) -> bool:
-    """Recursively check if there is a directGui object as a descendant to the np.
-    If there are any directGui object below the np in the scene graph return True."""
-    def _helper(node_path: p3d.NodePath):
-        if is_gui(node_path):
-            return True
+    """Check if there is a directGui object as a descendant to the np (that is not stashed).
+    If there are any directGui object below the np in the scene graph return True.
 
-        for child in node_path.get_children():
-            b = _helper(child)
-            if b:
-                return b
+    Uses the counts kept up to date by the widgets from BetterDirectGui, when np has them.
+    Only changes made through the widgets are counted (like 'widget.stash()' or 'widget.reparentTo(np)'),
+    stashing, moving or removing a plain node that has widgets below it leaves the counts of its ancestors outdated.
+    Nodes without counts (like the ones of widgets from direct.gui, or plain nodes that have been moved)
+    are searched instead, unless they are passed as a widget from BetterDirectGui (which tracks the widgets below it)."""
+    counts = np.getPythonTag(counts_tag)
+    if counts is None:
+        return not isinstance(np, DirectGuiBase.DirectGuiWidget) and _search_descendants(np, is_gui)
 
-        return False
-
-    for c in np.get_children():
-        if _helper(c):
-            return True
-
-    return False
+    return counts[0] > 0
 
 
 def has_selectable_gui(np: p3d.NodePath) -> bool:
     """Does the same as 'has_gui', but instead searches for an object that is currently selectable."""
-    def _helper(node_path: p3d.NodePath):
-        if is_selectable_gui(node_path):
-            return True
-
-        for child in node_path.get_children():
-            b = _helper(child)
-            if b:
-                return b
-
-        return False
+    counts = np.getPythonTag(counts_tag)
+    if counts is None:
+        return not isinstance(np, DirectGuiBase.DirectGuiWidget) and _search_descendants(np, is_selectable_gui)
+
+    return counts[1] > 0 and not np.isHidden() and not np.isStashed()
+
+
+def _search_descendants(np: p3d.NodePath, check) -> bool:
+    """Check the PGItems (the nodes of all DirectGui widgets) below np that are not stashed,
+    until 'check' returns True for one of them."""
+    return any(check(item) for item in np.findAllMatches("**/+PGItem"))
+
+
+def _add_to_ancestors(gui: DirectGuiBase.DirectGuiWidget, sign: int):
+    """Add (sign=1) or remove (sign=-1) gui and the widgets below it to/from the counts of its ancestors."""
+    counts = gui.getPythonTag(counts_tag)
+    guis = 1
+    selectable = 1 if gui._counted_selectable else 0
+    if counts is not None:
+        guis += counts[0]
+        selectable += counts[1]
+    _add_counts(gui, sign * guis, sign * selectable)
+
+
+def _add_counts(np: p3d.NodePath, guis: int, selectable: int):
+    """Add to the counts of the ancestors of np, up to the first ancestor that can't see np.
+    The counts of a node only include descendants that are not stashed (below the node),
+    and only count descendants as selectable if they are not hidden (below the node)."""
+    stashed = np.getStashedAncestor()  # the parent of this node does not have np as a child
+    while np != stashed:
+        if np.node().isOverallHidden():
+            selectable = 0
+            if guis == 0:
+                return
+        np = np.getParent()
+        if np.isEmpty():
+            return
+        counts = np.getPythonTag(counts_tag)
+        if counts is None:
+            np.setPythonTag(counts_tag, [guis, selectable])
+        else:
+            counts[0] += guis
+            counts[1] += selectable
+
+
+def get_gui_children(np: p3d.NodePath, include_stashed=False) -> list[DirectGuiBase]:
+    """Return a list of the children of the np that are directGui objects.
+    Stashed children are only included if 'include_stashed' is True."""
+    return list(_get_cached_children(np, include_stashed, False))
+
+
+def add_gui_children(np: p3d.NodePath, stack: list[DirectGuiBase.DirectGuiWidget]) -> list[DirectGuiBase.DirectGuiWidget]:
+    """Push the directGui children of np (including stashed ones) onto 'stack', in reverse order,
+    so popping the stack returns them in order. Returns 'stack'.
+    Meant for walking the scene-graph without recursion, the children are not sorted by sortOrder."""
+    start = len(stack)
+    _append_gui_children(np, stack)
+    stack[start:] = stack[start:][::-1]
+    return stack
+
+
+def _append_gui_children(np: p3d.NodePath, gui_list: list[DirectGuiBase.DirectGuiWidget]):
+    children = list(np.get_children())
+    children.extend(np.get_stashed_children())
+    for child in children:
+        if (gui := get_gui(child)) is not None:
+            gui_list.append(gui)
+        elif child.getName() == "canvas_parent":
+            _append_gui_children(child.children[0], gui_list)
 
-    for c in np.get_children():
-        if _helper(c):
-            return True
-
-    return False
 
+def get_selectable_gui_children(np: p3d.NodePath) -> list[p3d.NodePath]:
+    """Return a list of the children of the np that are currently selectable directGui objects."""
+    if np.isHidden() or np.isStashed():  # then none of the children are visible
+        return []
+    return list(_get_cached_children(np, False, True))
 
-def get_gui_children(np: p3d.NodePath) -> list[DirectGuiBase]:
-    """Return a list of the children of the np that are directGui objects."""
-    children = np.get_children()
-    children_list = []
-    for child in children:
-        if is_gui(child):
-            children_list.append(get_gui(child))
-        if child.name == "canvas_parent":
-            new_list = get_gui_children(child.children[0])
-            children_list.extend(new_list)
 
+def _get_cached_children(np: p3d.NodePath, include_stashed: bool, selectable: bool) -> list[DirectGuiBase.DirectGuiWidget]:
+    """Return the cached gui children of np, see 'children_tag'. Don't modify the returned list."""
     try:
-        if base.gui_controller.respect_sortOrder:
-            children_list.sort(key=lambda c: c["sortOrder"], reverse=True)
+        respect_sort_order = base.gui_controller.respect_sortOrder
     except NameError:  # base is not initialized yet
-        pass
+        respect_sort_order = False
 
+    cache = np.getPythonTag(children_tag)
+    if cache is None:
+        cache = {}
+        np.setPythonTag(children_tag, cache)
+
+    key = (include_stashed, selectable, respect_sort_order)
+    children_list = cache.get(key)
+    if children_list is None:
+        children_list = cache[key] = _find_gui_children(np, include_stashed, selectable, respect_sort_order)
     return children_list
 
 
-def get_selectable_gui_children(np: p3d.NodePath) -> list[p3d.NodePath]:
-    """Return a list of the children of the np that are currently selectable directGui objects."""
-    children = np.get_children()
+def _find_gui_children(np: p3d.NodePath, include_stashed: bool, selectable: bool,
+                       respect_sort_order: bool) -> list[DirectGuiBase.DirectGuiWidget]:
+    """Find the gui children of np. If 'selectable' is True, only include the children that are selectable,
+    without checking if np (or its ancestors) is hidden."""
+    children = list(np.get_children())
+    if include_stashed:
+        children.extend(np.get_stashed_children())
     children_list = []
     for child in children:
-        if is_selectable_gui(child):
-            children_list.append(get_gui(child))
-        if child.name == "canvas_parent":
-            new_list = get_selectable_gui_children(child.children[0])
-            children_list.extend(new_list)
+        if (gui := get_gui(child)) is not None:
+            if not selectable or (getattr(gui, "_counted_selectable", False) and not child.node().isOverallHidden()):
+                children_list.append(gui)
+        elif child.getName() == "canvas_parent":
+            canvas = child.children[0]
+            if not selectable or not (child.node().isOverallHidden() or canvas.node().isOverallHidden()):
+                children_list.extend(_get_cached_children(canvas, include_stashed, selectable))
 
-    try:
-        if base.gui_controller.respect_sortOrder:
-            children_list.sort(key=lambda c: c["sortOrder"], reverse=True)
-    except NameError:  # base is not initialized yet
-        pass
+    if respect_sort_order:
+        children_list.sort(key=lambda c: c["sortOrder"], reverse=True)
 
     return children_list
 
 
+def _clear_children_cache(gui: DirectGuiBase.DirectGuiWidget):
+    """Clear the cached children of the parent of gui, and of the scrolled frame if the parent is its canvas."""
+    parent = gui.getParent()
+    while not parent.isEmpty():
+        parent.clearPythonTag(children_tag)
+        if parent.getName() != "canvas" or parent.getParent().isEmpty():
+            return
+        parent = parent.getParent().getParent()  # the children of the canvas are included in the scrolled frame
+
+
+def get_frame_rect(gui: DirectGuiBase.DirectGuiWidget, other: p3d.NodePath) -> tuple[float, float, float, float]:
+    """Return the frame of gui as (left, right, bottom, top) in the coordinate system of 'other'.
+    If gui is rotated, the smallest rectangle containing the frame is returned."""
+    return _transform_frame(gui.guiItem.getFrame(), gui.getMat(other))
+
+
+def _transform_frame(frame: p3d.LVecBase4f, mat: p3d.LMatrix4f) -> tuple[float, float, float, float]:
+    left, right, bottom, top = frame
+    xs = []
+    zs = []
+    for x in (left, right):
+        for z in (bottom, top):
+            point = mat.xformPoint(p3d.Point3(x, 0, z))
+            xs.append(point.x)
+            zs.append(point.z)
+    return min(xs), max(xs), min(zs), max(zs)
+
+
 def get_parent(np: p3d.NodePath) -> p3d.NodePath:
     """Function to get the parent of given node,
     but it skips over any node called 'canvas'.
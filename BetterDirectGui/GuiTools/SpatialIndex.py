@@ -0,0 +1,354 @@
+"""Spatial indices of rectangles on screen, used to find the widgets at or near some point or widget.
+
+Rectangles are (left, right, bottom, top), in the coordinates of some node (like aspect2d).
+'SpatialIndex' is a uniform grid, each rectangle is stored in all the cells it overlaps.
+'WidgetIndex' keeps a 'SpatialIndex' of the frames of all widgets under a node up to date."""
+from __future__ import annotations
+from typing import Any, Callable
+import math
+
+import panda3d.core as p3d
+from BetterDirectGui.GuiTools import GuiUtil
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from BetterDirectGui import DirectGuiBase
+
+__all__ = ["SpatialIndex", "WidgetIndex", "directions"]
+
+Rect = tuple[float, float, float, float]
+
+# The (x, z) unit vector of each direction used for navigation
+directions = {
+    "u": (0, 1),
+    "d": (0, -1),
+    "l": (-1, 0),
+    "r": (1, 0),
+}
+
+
+class SpatialIndex:
+    """Uniform grid of items with a rectangle each."""
+
+    def __init__(self, cell_size=0.1):
+        self.cell_size = cell_size
+        self._cells: dict[tuple[int, int], dict[Any, None]] = {}  # dicts are used as ordered sets
+        self._rects: dict[Any, Rect] = {}
+        # the smallest and largest cell index in use along x and z
+        self._extent: list[int] | None = None
+
+    def __len__(self):
+        return len(self._rects)
+
+    def __contains__(self, item):
+        return item in self._rects
+
+    def __iter__(self):
+        return iter(self._rects)
+
+    def get_rect(self, item) -> Rect:
+        return self._rects[item]
+
+    def _cell_range(self, rect: Rect) -> tuple[int, int, int, int]:
+        size = self.cell_size
+        return (math.floor(rect[0] / size), math.floor(rect[1] / size),
+                math.floor(rect[2] / size), math.floor(rect[3] / size))
+
+    def insert(self, item, rect: Rect):
+        """Add item with the rectangle 'rect'. An item that is already in the index is moved to 'rect'."""
+        old_rect = self._rects.get(item)
+        if old_rect == rect:
+            return
+        if old_rect is not None:
+            self.remove(item)
+
+        self._rects[item] = rect
+        x_min, x_max, z_min, z_max = self._cell_range(rect)
+        for x in range(x_min, x_max + 1):
+            for z in range(z_min, z_max + 1):
+                self._cells.setdefault((x, z), {})[item] = None
+
+        if self._extent is None:
+            self._extent = [x_min, x_max, z_min, z_max]
+        else:
+            extent = self._extent
+            extent[0] = min(extent[0], x_min)
+            extent[1] = max(extent[1], x_max)
+            extent[2] = min(extent[2], z_min)
+            extent[3] = max(extent[3], z_max)
+
+    def remove(self, item):
+        rect = self._rects.pop(item)
+        x_min, x_max, z_min, z_max = self._cell_range(rect)
+        for x in range(x_min, x_max + 1):
+            for z in range(z_min, z_max + 1):
+                cell = self._cells[(x, z)]
+                del cell[item]
+                if not cell:
+                    del self._cells[(x, z)]
+
+    def query_rect(self, rect: Rect) -> list:
+        """Return the items with a rectangle that overlaps 'rect'."""
+        found = {}
+        x_min, x_max, z_min, z_max = self._cell_range(rect)
+        for x in range(x_min, x_max + 1):
+            for z in range(z_min, z_max + 1):
+                for item in self._cells.get((x, z), ()):
+                    if item not in found and _overlaps(self._rects[item], rect):
+                        found[item] = None
+        return list(found)
+
+    def query_point(self, x: float, z: float) -> list:
+        """Return the items with a rectangle that contains the point (x, z)."""
+        size = self.cell_size
+        cell = self._cells.get((math.floor(x / size), math.floor(z / size)), ())
+        return [item for item in cell if _overlaps(self._rects[item], (x, x, z, z))]
+
+    def nearest(self, x: float, z: float, exclude=None, accept: Callable[[Any], bool] = None) -> Any | None:
+        """Return the item with the rectangle closest to the point (x, z), or None if there is no such item.
+        Items that contain the point are at distance 0.
+
+        :param exclude: Item that is not returned.
+        :param accept: If specified, only items for which it returns True are returned.
+        """
+        return self._search((x, x, z, z), None, exclude, accept)
+
+    def nearest_in_direction(self, rect: Rect, direction: str, exclude=None,
+                             accept: Callable[[Any], bool] = None) -> Any | None:
+        """Return the item closest to 'rect' in 'direction' ("u", "d", "l" or "r"), or None if there is nothing there.
+
+        Only items with their center past the edge of 'rect' in that direction are considered.
+        The distance is the gap between the rectangles along the direction,
+        plus twice the gap across it (so items in line with 'rect' are preferred).
+        'exclude' and 'accept' work like in 'nearest'."""
+        return self._search(rect, directions[direction], exclude, accept)
+
+    def _search(self, rect: Rect, direction: tuple[int, int] | None, exclude, accept) -> Any | None:
+        if self._extent is None:
+            return None
+
+        x_min, x_max, z_min, z_max = self._cell_range(rect)
+        extent = self._extent
+        max_ring = max(x_min - extent[0], extent[1] - x_max, z_min - extent[2], extent[3] - z_max, 0)
+        dx, dz = direction or (0, 0)
+
+        best = None
+        best_score = None
+        seen = set()
+        for ring in range(max_ring + 1):
+            for cell in _ring_cells(x_min, x_max, z_min, z_max, ring, dx, dz):
+                for item in self._cells.get(cell, ()):
+                    if item in seen or item is exclude:
+                        continue
+                    seen.add(item)
+                    if direction is None:
+                        score = (_distance(rect, self._rects[item]), 0)
+                    else:
+                        score = _direction_score(rect, self._rects[item], dx, dz)
+                    if score is not None and (best_score is None or score < best_score) and \
+                            (accept is None or accept(item)):
+                        best, best_score = item, score
+
+            # the items in the next rings are at least 'ring' cells away
+            if best_score is not None and best_score[0] <= ring * self.cell_size:
+                break
+
+        return best
+
+
+class _Entry:
+    """A node on the path from the base node to some widget, with the bounds and transform it had
+    when the frames of the widgets below it were last found."""
+    __slots__ = ("node", "bounds", "transform", "gui", "children")
+
+    def __init__(self, node: p3d.PandaNode, gui: DirectGuiBase.DirectGuiWidget | None):
+        self.node = node
+        # the objects are kept (not just their addresses) so a new object can't get the same address
+        self.bounds = node.getBounds()
+        self.transform = node.getTransform()
+        self.gui = gui
+        self.children: dict[int, _Entry] = {}  # by the address of the node
+
+
+class WidgetIndex:
+    """The frames of the widgets under 'base_np', in the coordinates of 'base_np'.
+    Hidden and stashed widgets are not included.
+
+    The queries update the index first. Panda3D gives a node new bounds when anything below it changes
+    (a transform, state or geometry, or nodes added and removed), and a node gets a new transform when it moves.
+    (Changing the frame of a PGItem counts as a change of its geometry.)
+    So an update only walks the paths to the nodes that changed, and finds the frames again below the nodes that moved.
+    """
+
+    def __init__(self, base_np: p3d.NodePath, cell_size=0.1):
+        self._base_np = base_np
+        self._index = SpatialIndex(cell_size)
+        self._root: _Entry | None = None
+        self._entries: dict[DirectGuiBase.DirectGuiWidget, _Entry] = {}
+
+    def __len__(self):
+        self.update()
+        return len(self._index)
+
+    def __contains__(self, gui):
+        self.update()
+        return gui in self._index
+
+    def get_rect(self, gui: DirectGuiBase.DirectGuiWidget) -> Rect:
+        """The frame of gui as (left, right, bottom, top) in the coordinates of base_np."""
+        self.update()
+        return self._index.get_rect(gui)
+
+    def widgets_at(self, x: float, z: float) -> list[DirectGuiBase.DirectGuiWidget]:
+        """The widgets with a frame that contains the point (x, z)."""
+        self.update()
+        return self._index.query_point(x, z)
+
+    def widgets_in(self, rect: Rect) -> list[DirectGuiBase.DirectGuiWidget]:
+        """The widgets with a frame that overlaps rect = (left, right, bottom, top)."""
+        self.update()
+        return self._index.query_rect(rect)
+
+    def nearest(self, x: float, z: float, exclude=None,
+                accept: Callable[[DirectGuiBase.DirectGuiWidget], bool] = None) -> DirectGuiBase.DirectGuiWidget | None:
+        """The widget with the frame closest to the point (x, z), see 'SpatialIndex.nearest'."""
+        self.update()
+        return self._index.nearest(x, z, exclude, accept)
+
+    def nearest_in_direction(self, rect: Rect, direction: str, exclude=None,
+                             accept: Callable[[DirectGuiBase.DirectGuiWidget], bool] = None
+                             ) -> DirectGuiBase.DirectGuiWidget | None:
+        """The widget closest to rect in direction, see 'SpatialIndex.nearest_in_direction'."""
+        self.update()
+        return self._index.nearest_in_direction(rect, direction, exclude, accept)
+
+    def update(self):
+        """Find the frames of the widgets that have changed since the last update."""
+        node = self._base_np.node()
+        if self._root is None or self._root.node.this != node.this:
+            if self._root is not None:
+                self._remove(self._root)
+            self._root = _Entry(node, None)
+            self._add_children(self._root, self._base_np, p3d.LMatrix4f.identMat())
+            return
+
+        bounds = node.getBounds()
+        if bounds.this != self._root.bounds.this:
+            self._root.bounds = bounds
+            self._update_children(self._root, self._base_np, p3d.LMatrix4f.identMat())
+
+    def _retake_bounds(self, gui: DirectGuiBase.DirectGuiWidget):
+        """Take the bounds of the nodes from base_np to gui again, after a change to gui that doesn't move it
+        (like the color scale used to highlight it). The index must have been up to date before the change."""
+        entry = self._entries.get(gui)
+        if entry is None:
+            return
+
+        path = [np.node().this for np in reversed(gui.getAncestors())]  # from the root down to gui
+        entry = self._root
+        entry.bounds = entry.node.getBounds()
+        for key in path[path.index(entry.node.this) + 1:]:
+            entry = entry.children[key]
+            entry.bounds = entry.node.getBounds()
+
+    def _update_children(self, entry: _Entry, np: p3d.NodePath, mat: p3d.LMatrix4f):
+        """The bounds of entry have changed, find what has changed below it."""
+        if entry.gui is not None:  # the frame might have changed
+            self._index.insert(entry.gui, GuiUtil._transform_frame(entry.gui.guiItem.getFrame(), mat))
+
+        old_children = entry.children
+        entry.children = {}
+        for i, child_node in enumerate(np.node().getChildren()):
+            key = child_node.this
+            child = old_children.pop(key, None)
+            bounds = child_node.getBounds()
+            # a node gets new bounds when it is moved or hidden as well, so this is all that is checked for most nodes
+            if child is not None and bounds.this == child.bounds.this:
+                entry.children[key] = child
+                continue
+
+            child_np = np.getChild(i)
+            gui = GuiUtil.get_gui(child_np)
+            if (gui is None and not GuiUtil.has_gui(child_np)) or child_node.isOverallHidden():
+                if child is not None:
+                    self._remove(child)
+                continue
+
+            if child is None or child.gui is not gui or child.transform.this != child_node.getTransform().this:
+                if child is not None:
+                    self._remove(child)
+                child = self._add(child_np, gui, mat)
+            else:
+                child.bounds = bounds
+                self._update_children(child, child_np, child_np.getMat() * mat)
+            entry.children[key] = child
+
+        for child in old_children.values():  # removed or stashed
+            self._remove(child)
+
+    def _add(self, np: p3d.NodePath, gui: DirectGuiBase.DirectGuiWidget | None, parent_mat: p3d.LMatrix4f) -> _Entry:
+        entry = _Entry(np.node(), gui)
+        mat = np.getMat() * parent_mat
+        if gui is not None:
+            self._index.insert(gui, GuiUtil._transform_frame(gui.guiItem.getFrame(), mat))
+            self._entries[gui] = entry
+        self._add_children(entry, np, mat)
+        return entry
+
+    def _add_children(self, entry: _Entry, np: p3d.NodePath, mat: p3d.LMatrix4f):
+        for child_np in np.getChildren():
+            gui = GuiUtil.get_gui(child_np)
+            if (gui is None and not GuiUtil.has_gui(child_np)) or child_np.node().isOverallHidden():
+                continue
+            entry.children[child_np.node().this] = self._add(child_np, gui, mat)
+
+    def _remove(self, entry: _Entry):
+        stack = [entry]
+        while stack:
+            entry = stack.pop()
+            # a widget that was moved to another parent may already have a new entry
+            if entry.gui is not None and self._entries.get(entry.gui) is entry:
+                del self._entries[entry.gui]
+                self._index.remove(entry.gui)
+            stack.extend(entry.children.values())
+
+
+def _overlaps(a: Rect, b: Rect) -> bool:
+    return a[0] <= b[1] and b[0] <= a[1] and a[2] <= b[3] and b[2] <= a[3]
+
+
+def _distance(a: Rect, b: Rect) -> float:
+    dx = max(b[0] - a[1], a[0] - b[1], 0)
+    dz = max(b[2] - a[3], a[2] - b[3], 0)
+    return math.hypot(dx, dz)
+
+
+def _ring_cells(x_min: int, x_max: int, z_min: int, z_max: int, ring: int, dx: int, dz: int):
+    """The cells 'ring' cells outside the range of cells (all cells in the range for ring 0),
+    skipping the cells that are behind the range in the direction (dx, dz)."""
+    left, right, bottom, top = x_min - ring, x_max + ring, z_min - ring, z_max + ring
+    for x in range(left, right + 1):
+        column = range(bottom, top + 1) if ring == 0 or x == left or x == right else (bottom, top)
+        for z in column:
+            if (dx > 0 and x < x_min) or (dx < 0 and x > x_max) or (dz > 0 and z < z_min) or (dz < 0 and z > z_max):
+                continue
+            yield x, z
+
+
+def _direction_score(current: Rect, other: Rect, dx: int, dz: int) -> tuple[float, float] | None:
+    # how far the center of 'other' is past the edge of 'current' in the direction
+    if dx:
+        along = ((other[0] + other[1]) / 2 - (current[1] if dx > 0 else current[0])) * dx
+    else:
+        along = ((other[2] + other[3]) / 2 - (current[3] if dz > 0 else current[2])) * dz
+    if along <= 0:  # not in the direction
+        return None
+
+    if dx:
+        gap = other[0] - current[1] if dx > 0 else current[0] - other[1]
+        across = max(other[2] - current[3], current[2] - other[3], 0)
+    else:
+        gap = other[2] - current[3] if dz > 0 else current[2] - other[3]
+        across = max(other[0] - current[1], current[0] - other[1], 0)
+
+    return max(gap, 0) + 2 * across, along
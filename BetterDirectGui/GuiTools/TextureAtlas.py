@@ -0,0 +1,205 @@
+"""Tools to pack the textures of a theme into a single texture atlas.
+Fewer textures means fewer texture changes when rendering a themed gui."""
+from __future__ import annotations
+from typing import Any
+import panda3d.core as p3d
+from BetterDirectGui.GuiTools import ThemeUtil
+
+__all__ = ["AtlasRegion", "TextureAtlas", "pack_theme"]
+
+
+class AtlasRegion:
+    """A part of a TextureAtlas. Can be used instead of a texture in the 'frameTexture' options of a widget."""
+    __slots__ = ("atlas", "name", "uv_min", "uv_max", "transform")
+
+    def __init__(self, atlas: TextureAtlas, name: str, uv_min: tuple[float, float], uv_max: tuple[float, float]):
+        self.atlas = atlas
+        self.name = name
+        self.uv_min = uv_min
+        self.uv_max = uv_max
+        # maps the uv-coordinates of a texture to the uv-coordinates of this region in the atlas
+        self.transform: p3d.TransformState = p3d.TransformState.makePosRotateScale2d(
+            uv_min, 0, (uv_max[0] - uv_min[0], uv_max[1] - uv_min[1]))
+
+    @property
+    def texture(self) -> p3d.Texture:
+        return self.atlas.texture
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name!r})"
+
+
+class TextureAtlas:
+    """A texture with several images packed into it. Use 'regions' to get the part of the atlas with some image."""
+
+    def __init__(self, texture: p3d.Texture, regions: dict[Any, AtlasRegion]):
+        self.texture = texture
+        self.regions = regions
+
+    def __getitem__(self, key) -> AtlasRegion:
+        return self.regions[key]
+
+    def __contains__(self, key):
+        return key in self.regions
+
+    @classmethod
+    def build(cls, textures: list[str | p3d.Texture], padding=2, max_size=4096, image_scale=1.0,
+              name="atlas") -> TextureAtlas:
+        """Pack 'textures' (paths or Textures) into a new atlas. The region of each texture is stored with the
+        texture (or path) as key.
+
+        :param padding: Pixels around each image that are filled with its edge, to prevent bleeding between images.
+        :param max_size: Max width and height of the atlas.
+        :param image_scale: Scale of the images in the atlas, the bundled assets are much larger than needed for most gui:s.
+        """
+        images = {}
+        for texture in textures:
+            if texture in images:
+                continue
+            if isinstance(texture, str):
+                loaded = p3d.TexturePool.loadTexture(texture)
+                if loaded is None:
+                    raise IOError(f"Could not load texture: {texture}")
+            else:
+                loaded = texture
+            image = p3d.PNMImage()
+            loaded.store(image)
+            if image_scale != 1:
+                scaled = p3d.PNMImage(max(1, round(image.getXSize() * image_scale)),
+                                      max(1, round(image.getYSize() * image_scale)), image.getNumChannels())
+                scaled.gaussianFilterFrom(1.0, image)
+                image = scaled
+            images[texture] = _pad_image(image, padding)
+
+        positions, width, height = _pack(images, max_size)
+
+        atlas_image = p3d.PNMImage(width, height, 4)
+        atlas_image.fill(0)
+        atlas_image.alphaFill(0)
+        for key, (x, y) in positions.items():
+            atlas_image.copySubImage(images[key], x, y)
+
+        atlas_texture = p3d.Texture(name)
+        atlas_texture.load(atlas_image)
+        # no mipmaps, they would blend the images together
+        atlas_texture.setMinfilter(p3d.SamplerState.FT_linear)
+        atlas_texture.setMagfilter(p3d.SamplerState.FT_linear)
+        atlas_texture.setWrapU(p3d.SamplerState.WM_clamp)
+        atlas_texture.setWrapV(p3d.SamplerState.WM_clamp)
+
+        atlas = cls(atlas_texture, {})
+        for key, (x, y) in positions.items():
+            image = images[key]
+            # skip the padding, and flip y since v goes upwards while the rows of the image goes downwards
+            left, right = x + padding, x + image.getXSize() - padding
+            top, bottom = y + padding, y + image.getYSize() - padding
+            name_ = key if isinstance(key, str) else key.getName()
+            atlas.regions[key] = AtlasRegion(atlas, name_,
+                                             (left / width, 1 - bottom / height),
+                                             (right / width, 1 - top / height))
+
+        return atlas
+
+
+def _pad_image(image: p3d.PNMImage, padding: int) -> p3d.PNMImage:
+    """Return a copy of image with 'padding' pixels on each side, filled by repeating the edges of the image."""
+    x_size, y_size = image.getXSize(), image.getYSize()
+    padded = p3d.PNMImage(x_size + 2 * padding, y_size + 2 * padding, 4)
+    if not image.hasAlpha():
+        padded.alphaFill(1)
+    padded.copySubImage(image, padding, padding)
+
+    for i in range(padding):
+        # columns to the left and right, then whole rows above and below (which also fills the corners)
+        padded.copySubImage(image, i, padding, 0, 0, 1, y_size)
+        padded.copySubImage(image, padding + x_size + i, padding, x_size - 1, 0, 1, y_size)
+    for i in range(padding):
+        padded.copySubImage(padded, 0, i, 0, padding, padded.getXSize(), 1)
+        padded.copySubImage(padded, 0, padding + y_size + i, 0, padding + y_size - 1, padded.getXSize(), 1)
+
+    return padded
+
+
+def _pack(images: dict[Any, p3d.PNMImage], max_size: int) -> tuple[dict[Any, tuple[int, int]], int, int]:
+    """Place the images in rows (highest first), and return the position of each image and the size of the atlas.
+    Tries every power of two as width, and uses the one that gives the smallest atlas."""
+    widest = max((image.getXSize() for image in images.values()), default=1)
+    width = 1
+    while width < widest:
+        width *= 2
+
+    best = None
+    while width <= max_size:
+        positions, height = _pack_rows(images, width)
+        if height <= max_size and (best is None or width * height < best[1] * best[2]):
+            best = positions, width, height
+        width *= 2
+
+    if best is None:
+        raise ValueError(f"The textures do not fit in an atlas of size {max_size}x{max_size}")
+    return best
+
+
+def _pack_rows(images: dict[Any, p3d.PNMImage], width: int) -> tuple[dict[Any, tuple[int, int]], int]:
+    positions = {}
+    x = y = row_height = 0
+    for key, image in sorted(images.items(), key=lambda item: item[1].getYSize(), reverse=True):
+        if x + image.getXSize() > width:  # start a new row
+            x = 0
+            y += row_height
+            row_height = 0
+        positions[key] = (x, y)
+        x += image.getXSize()
+        row_height = max(row_height, image.getYSize())
+
+    height = 1
+    while height < y + row_height:
+        height *= 2
+    return positions, height
+
+
+def _is_atlas_option(option: str) -> bool:
+    """Can the option use AtlasRegions? (like 'frameTexture' or 'indicator_frameTexture')"""
+    return option.endswith("frameTexture")
+
+
+def pack_theme(theme: dict[str: dict[str: Any]], padding=2, max_size=4096, image_scale=1.0) -> ThemeUtil.Theme:
+    """Pack all textures used by the 'frameTexture' options of theme into one atlas,
+    and return a theme that uses the regions of the atlas instead. See TextureAtlas.build for the parameters."""
+    theme = ThemeUtil.freeze(theme)
+
+    def textures_of(value) -> list:
+        if isinstance(value, (str, p3d.Texture)):
+            return [value]
+        if isinstance(value, (list, tuple)):
+            return [texture for texture in value if isinstance(texture, (str, p3d.Texture))]
+        return []
+
+    textures = []
+    for options in theme.values():
+        for option, value in options.items():
+            if _is_atlas_option(option):
+                textures.extend(textures_of(value))
+
+    if not textures:
+        return theme
+
+    atlas = TextureAtlas.build(textures, padding, max_size, image_scale)
+
+    def to_region(texture):
+        if isinstance(texture, (str, p3d.Texture)):
+            return atlas[texture]
+        return texture
+
+    elements = {}
+    for name, options in theme.items():
+        new_values = {}
+        for option, value in options.items():
+            if _is_atlas_option(option) and textures_of(value):
+                if isinstance(value, (list, tuple)):
+                    new_values[option] = type(value)(to_region(texture) for texture in value)
+                else:
+                    new_values[option] = to_region(value)
+        elements[name] = options.updated(new_values)
+
+    return ThemeUtil.Theme(elements)
@@ -0,0 +1,109 @@
+"""Load themes from json or toml files.
+
+A theme file has the same layout as the theme dicts in Themes.py, with a section for 'general',
+'sub-<Class>' and each type of element. Lists are converted to tuples, and the placeholders
+{root}, {assets}, {dark} and {light} in strings are replaced with the directories from ThemeUtil.
+Use "extends" to base the theme on another theme file (relative to this file), or on a theme from Themes.py,
+like "extends": "Themes.dark_theme".
+
+The options of the theme are resolved for each widget class when the theme is loaded.
+"""
+from __future__ import annotations
+from typing import Any
+import json
+import os
+
+from BetterDirectGui import DirectGui  # make sure the widget classes exist, so their options can be resolved
+from BetterDirectGui.DirectGuiBase import DirectGuiWidget
+from BetterDirectGui.GuiTools import ThemeUtil
+
+__all__ = ["load_theme"]
+
+placeholders = {
+    "{root}": str(ThemeUtil.root),
+    "{assets}": ThemeUtil.assets,
+    "{dark}": ThemeUtil.dark,
+    "{light}": ThemeUtil.light,
+}
+
+
+def load_theme(path: str, compile=False) -> ThemeUtil.Theme:
+    """Load the theme in the json or toml file at 'path'.
+
+    :param compile: If True: preload the textures of the theme, see ThemeUtil.compile_theme.
+    """
+    theme = _read_theme_file(os.path.abspath(path))
+    resolved = {_class_key(widget_class): widget_class._resolve_theme_options(theme)
+                for widget_class in _get_widget_classes()}
+
+    if compile:
+        # compile the resolved options with the same textures as the theme
+        textures, load_times = {}, {}
+        theme = ThemeUtil._load_textures(theme, textures, load_times)
+        resolved = ThemeUtil._load_textures(ThemeUtil.Theme(resolved), textures, load_times)
+
+    classes = {_class_key(widget_class): widget_class for widget_class in _get_widget_classes()}
+    DirectGuiWidget.add_resolved_theme_options(
+        theme, {classes[key]: options for key, options in resolved.items() if key in classes})
+
+    return theme
+
+
+def _read_theme_file(path: str) -> ThemeUtil.Theme:
+    """Parse the theme file at 'path', and merge it with the theme it extends."""
+    with open(path, "rb") as file:
+        data = file.read()
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".json":
+        content = json.loads(data)
+    elif extension == ".toml":
+        try:
+            import tomllib
+        except ImportError:
+            raise ImportError("Loading toml theme files requires Python 3.11 or later") from None
+        content = tomllib.loads(data.decode())
+    else:
+        raise ValueError(f"Unknown theme file type '{extension}', use .json or .toml")
+
+    extends = content.pop("extends", None)
+    theme = {name: {option: _convert_value(value) for option, value in options.items()}
+             for name, options in content.items()}
+
+    if extends is None:
+        return ThemeUtil.Theme(theme)
+
+    if extends.startswith("Themes."):
+        from BetterDirectGui.GuiTools import Themes
+        base_theme = getattr(Themes, extends.removeprefix("Themes."))
+    else:
+        base_theme = _read_theme_file(os.path.join(os.path.dirname(path), extends))
+
+    return ThemeUtil.merge(base_theme, theme)
+
+
+def _convert_value(value) -> Any:
+    """Convert lists to tuples and replace the placeholders in strings."""
+    if isinstance(value, list):
+        return tuple(_convert_value(item) for item in value)
+    if isinstance(value, dict):
+        return {key: _convert_value(item) for key, item in value.items()}
+    if isinstance(value, str):
+        for placeholder, replacement in placeholders.items():
+            value = value.replace(placeholder, replacement)
+    return value
+
+
+def _get_widget_classes() -> list[type[DirectGuiWidget]]:
+    """Return all subclasses of DirectGuiWidget."""
+    classes = []
+    unvisited = [DirectGuiWidget]
+    while unvisited:
+        widget_class = unvisited.pop()
+        classes.append(widget_class)
+        unvisited.extend(widget_class.__subclasses__())
+    return classes
+
+
+def _class_key(widget_class: type) -> str:
+    return f"{widget_class.__module__}.{widget_class.__qualname__}"
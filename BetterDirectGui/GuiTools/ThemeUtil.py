@@ -1,9 +1,14 @@
 """Tools to work with themes."""
+from __future__ import annotations
+from collections.abc import Mapping
 from copy import deepcopy
 from typing import Any
 from panda3d.core import Filename
+import panda3d.core as p3d
 import os
 import sys
+import threading
+import time
 
 # some useful directories for assets
 root = Filename.fromOsSpecific(os.path.dirname(os.path.dirname(__file__)))
@@ -15,28 +20,251 @@ dark = f"{assets}/dark"
 light = f"{assets}/light"
 
 
-def merge(theme1: dict[str: dict[str: Any]] = None, theme2: dict[str: dict[str: Any]] = None) -> dict[str: dict[str: Any]]:
-    """Return a new theme that is based on theme1 and updated with the values from theme2."""
-    new_theme = deepcopy(theme1)
-    if new_theme is None:
-        new_theme = {}
+def _copy_value(value) -> Any:
+    """Copy the lists, dicts and sets in value. Other objects (like Textures) are shared, not copied."""
+    if isinstance(value, list):
+        return [_copy_value(item) for item in value]
+    if type(value) is tuple:
+        return tuple(_copy_value(item) for item in value)
+    if isinstance(value, dict):
+        return {key: _copy_value(item) for key, item in value.items()}
+    if isinstance(value, set):
+        return {_copy_value(item) for item in value}
+    return value
 
+
+def _freeze(value) -> Any:
+    """Return a hashable version of value, used to hash the options of a theme."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, Mapping):
+        return frozenset((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(item) for item in value)
+    try:
+        hash(value)
+    except TypeError:  # only use the type, so values that are equal still hash the same
+        return type(value).__name__
+    return value
+
+
+class ThemeOptions(Mapping):
+    """Read-only dict of the options a theme sets for one type of element."""
+    __slots__ = ("_options", "_hash")
+
+    def __init__(self, options: Mapping[str, Any] = None):
+        self._options: dict[str, Any] = _copy_value(dict(options)) if options is not None else {}
+        self._hash: int | None = None
+
+    @classmethod
+    def _wrap(cls, options: dict[str, Any]) -> ThemeOptions:
+        """Create ThemeOptions using the dict 'options' directly, without copying it."""
+        new_options = cls.__new__(cls)
+        new_options._options = options
+        new_options._hash = None
+        return new_options
+
+    def __getitem__(self, key: str) -> Any:
+        return self._options[key]
+
+    def __iter__(self):
+        return iter(self._options)
+
+    def __len__(self):
+        return len(self._options)
+
+    def __contains__(self, key):
+        return key in self._options
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(_freeze(self._options))
+        return self._hash
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self._options!r})"
+
+    def copy(self) -> dict[str, Any]:
+        """Return a (shallow) copy of the options as a normal dict."""
+        return self._options.copy()
+
+    def updated(self, options: Mapping[str, Any]) -> ThemeOptions:
+        """Return options updated with the values from 'options'. Returns self if nothing would change."""
+        if all(key in self._options and self._options[key] == value for key, value in options.items()):
+            return self
+
+        new_options = self._options.copy()  # the old values can be shared, they are never changed
+        new_options.update(_copy_value(dict(options)))
+        return self._wrap(new_options)
+
+
+class Theme(Mapping):
+    """Immutable and hashable theme. Maps the names of the element types (and 'general') to ThemeOptions.
+    Equal themes share the resolved options of their elements, and can be used as keys in dicts."""
+    __slots__ = ("_elements", "_hash")
+
+    def __init__(self, theme: Mapping[str, Mapping[str, Any]] = None):
+        if isinstance(theme, Theme):
+            self._elements = theme._elements
+        else:
+            self._elements: dict[str, ThemeOptions] = {}
+            if theme is not None:
+                for name, options in theme.items():
+                    if not isinstance(options, ThemeOptions):
+                        options = ThemeOptions(options)
+                    self._elements[name] = options
+        self._hash: int | None = None
+
+    @classmethod
+    def _wrap(cls, elements: dict[str, ThemeOptions]) -> Theme:
+        """Create a Theme using the dict 'elements' directly, without copying it."""
+        theme = cls.__new__(cls)
+        theme._elements = elements
+        theme._hash = None
+        return theme
+
+    def __getitem__(self, key: str) -> ThemeOptions:
+        return self._elements[key]
+
+    def __iter__(self):
+        return iter(self._elements)
+
+    def __len__(self):
+        return len(self._elements)
+
+    def __contains__(self, key):
+        return key in self._elements
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(frozenset(self._elements.items()))
+        return self._hash
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self._elements!r})"
+
+    def to_dict(self) -> dict[str: dict[str: Any]]:
+        """Return an editable copy of the theme, made of normal dicts."""
+        return {name: _copy_value(options.copy()) for name, options in self._elements.items()}
+
+
+def freeze(theme: dict[str: dict[str: Any]] | None) -> Theme:
+    """Return theme as a Theme. Themes are returned as they are, since they can't be changed."""
+    if isinstance(theme, Theme):
+        return theme
+    return Theme(theme)
+
+
+def merge(theme1: dict[str: dict[str: Any]] = None, theme2: dict[str: dict[str: Any]] = None) -> Theme:
+    """Return a new theme that is based on theme1 and updated with the values from theme2.
+    The new theme shares the options of all element types that theme2 does not change with theme1."""
+    new_theme = freeze(theme1)
     if theme2 is None:
         return new_theme
 
+    elements = new_theme._elements.copy()
     for key, value in theme2.items():
-        if key in new_theme:
-            new_theme[key].update(value)
+        if key in elements:
+            elements[key] = elements[key].updated(value)
+        elif isinstance(value, ThemeOptions):
+            elements[key] = value
         else:
-            new_theme[key] = value
+            elements[key] = ThemeOptions(value)
 
-    return new_theme
+    return Theme._wrap(elements)
+
+
+class CompiledTheme(Theme):
+    """Theme where the paths to textures have been replaced with preloaded Texture objects.
+    'load_times' maps the path of each texture to the time (in seconds) it took to load it."""
+    __slots__ = ("load_times",)
+
+    def __init__(self, theme: Mapping[str, Mapping[str, Any]] = None, load_times: dict[str, float] = None):
+        super().__init__(theme)
+        self.load_times: dict[str, float] = load_times if load_times is not None else {}
+
+    @classmethod
+    def _wrap_compiled(cls, elements: dict[str, ThemeOptions], load_times: dict[str, float]) -> CompiledTheme:
+        theme = cls._wrap(elements)
+        theme.load_times = load_times
+        return theme
+
+
+def _is_texture_option(option: str) -> bool:
+    """Can the option be a texture or a list of textures (like 'frameTexture' or 'indicator_frameTexture')?"""
+    return option.endswith("Texture")
+
+
+def _is_image_option(option: str) -> bool:
+    """Can the option be a single texture or model (like 'image' or 'checkedImage')?"""
+    return option == "image" or option.endswith(("_image", "Image"))
+
+
+def _is_model_path(path: str) -> bool:
+    """Is path a model that the loader can load (instead of a texture)?"""
+    extension = p3d.Filename(path).getExtension()
+    if extension == "pz":  # compressed file, check the real extension
+        extension = p3d.Filename(p3d.Filename(path).getBasenameWoExtension()).getExtension()
+    return p3d.LoaderFileTypeRegistry.getGlobalPtr().getTypeFromExtension(extension) is not None
+
+
+def _load_textures(theme: Theme, textures: dict[str, p3d.Texture | None], load_times: dict[str, float]) -> CompiledTheme:
+    def load(path: str):
+        if path not in textures:
+            start = time.perf_counter()
+            textures[path] = p3d.TexturePool.loadTexture(path)
+            load_times[path] = time.perf_counter() - start
+        if textures[path] is None:  # could not load the texture, keep the path so the widget raises the error
+            return path
+        return textures[path]
+
+    elements = {}
+    for name, options in theme.items():
+        new_values = {}
+        for option, value in options.items():
+            if _is_texture_option(option):
+                if isinstance(value, str):
+                    new_values[option] = load(value)
+                elif isinstance(value, (list, tuple)) and any(isinstance(texture, str) for texture in value):
+                    new_values[option] = type(value)(load(texture) if isinstance(texture, str) else texture
+                                                     for texture in value)
+            # only single paths, a pair of strings for an image is a model and the name of a node in it
+            elif _is_image_option(option) and isinstance(value, str) and not _is_model_path(value):
+                new_values[option] = load(value)
+        elements[name] = options.updated(new_values)
+
+    return CompiledTheme._wrap_compiled(elements, load_times)
+
+
+def compile_theme(theme: dict[str: dict[str: Any]], background=False) -> CompiledTheme | p3d.AsyncFuture:
+    """Load all textures that theme refers to by path, and return a CompiledTheme that uses the loaded Textures instead.
+    Every texture is only loaded once, and is shared by all elements using it.
+    The time it took to load each texture can be found in 'load_times' of the returned theme.
+
+    :param background: If True: load the textures on a background thread, and return an AsyncFuture with the CompiledTheme.
+    """
+    theme = freeze(theme)
+    textures: dict[str, p3d.Texture | None] = {}
+    load_times: dict[str, float] = {}
+    if not background:
+        return _load_textures(theme, textures, load_times)
+
+    future = p3d.AsyncFuture()
+
+    def load():
+        try:
+            future.set_result(_load_textures(theme, textures, load_times))
+        except Exception as e:
+            future.set_exception(e)
+
+    threading.Thread(target=load, name="compile-theme", daemon=True).start()
+    return future
 
 
 def create_theme_from_gui(widget, general_options=None) -> dict[str: dict[str: Any]]:
     """Take the options set by the user on the widget and make a theme based on it.
         Use 'general_options' to fill the 'general' field of the theme."""
-    new_theme = {type(widget).__name__: deepcopy(widget._kw)}
+    new_theme = {type(widget).__name__: deepcopy(dict(widget._kw))}  # _kw can be the shared read-only empty mapping
     if general_options is not None:
         new_theme["general"] = general_options
 
@@ -48,7 +276,7 @@ def create_theme_from_guis(widgets: list, general_options=None) -> dict[str: dic
         Use 'general_options' to fill the 'general' field of the theme."""
     new_theme = {}
     for widget in widgets:
-        new_theme[type(widget).__name__] = deepcopy(widget._kw)
+        new_theme[type(widget).__name__] = deepcopy(dict(widget._kw))
 
     if general_options is not None:
         new_theme["general"] = general_options
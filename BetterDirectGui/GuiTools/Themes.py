@@ -40,7 +40,7 @@ rescale = {
 
 # Mostly for compatibility with old project created with the normal directGui.
 # Creates a new look without (hopefully) changing any sizing.
-default_theme_no_scale = {
+default_theme_no_scale = ThemeUtil.Theme({
     "general": dict(
         # text_shadow=(.6, .6, .6, 1),
         # text_shadowOffset=(0.05, 0.05),
@@ -176,7 +176,7 @@ default_theme_no_scale = {
     "DirectSpinBox": dict(
 
     ),
-}
+})
 
 # Mostly for compatibility with old project created with the normal directGui.
 # Creates a new look without (hopefully) changing any sizing.
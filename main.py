@@ -77,6 +77,30 @@ if __name__ == '__main__':
         import tests.draggable_tile_test
     elif run_test == 8:
         from tests import all_no_options
+    elif run_test == 9:
+        import tests.theme_switch_benchmark
+    elif run_test == 10:
+        import tests.texture_atlas_benchmark
+    elif run_test == 11:
+        import tests.theme_file
+    elif run_test == 12:
+        import tests.theme_propagation_benchmark
+    elif run_test == 14:
+        import tests.copy_benchmark
+    elif run_test == 15:
+        import tests.option_observers
+    elif run_test == 16:
+        import tests.memory_benchmark
+    elif run_test == 17:
+        import tests.navigation_benchmark
+    elif run_test == 18:
+        import tests.spatial_index_benchmark
+    elif run_test == 19:
+        import tests.option_menu_theme
+    elif run_test == 20:
+        import tests.navigation_map
+    elif run_test == 21:
+        import tests.theme_from_gui
 
     if do_theme == 1:
         base.gui_controller.set_theme(theme)
@@ -0,0 +1,47 @@
+"""Times DirectGuiWidget.copy, like when DraggableItem splits a stack, compared with creating the widget again.
+The items are placed in tiles with a theme of their own, while the gui controller uses another theme.
+copy still runs the constructor, it only skips applying the theme of the gui controller first,
+which makes it about 2x faster (1.6x to 2.2x here)."""
+import time
+
+from BetterDirectGui.DirectGui import *
+from BetterDirectGui.NewWidgets import *
+from BetterDirectGui.GuiTools import Themes
+
+base.gui_controller.set_theme(Themes.default_theme, 1)
+
+widgets = [
+    (DraggableItem, dict(stackSize=10, itemCount=8)),
+    (DirectButton, dict(text="Button")),
+    (DirectLabel, dict(text="Label")),
+    (DirectSlider, dict()),
+]
+
+
+def create_again(widget):
+    """What copy did before: create the widget with the theme of the gui controller, then replace the theme."""
+    new_widget = type(widget)(**widget._kw)
+    if new_widget._theme != widget._theme:
+        new_widget.set_theme(widget._theme, widget._theme_priority)
+    return new_widget
+
+
+count = 50
+for widget_class, kwargs in widgets:
+    tile = DraggableTile()
+    tile.set_theme(Themes.dark_theme, 2)
+    widget = widget_class(parent=tile, **kwargs)
+
+    start = time.perf_counter()
+    for _ in range(count):
+        create_again(widget).destroy()
+    again = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(count):
+        widget.copy().destroy()
+    copy = time.perf_counter() - start
+
+    print(f"{widget_class.__name__:15} create again {again / count * 1e6:5.0f} us, copy {copy / count * 1e6:5.0f} us, "
+          f"{again / copy:.1f}x faster")
+    tile.destroy()
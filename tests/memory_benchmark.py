@@ -0,0 +1,66 @@
+"""Measures the Python memory used per widget for each type of widget from all_no_options.py (with tracemalloc,
+so memory allocated by Panda3D itself is not included), and how much of it is the bookkeeping used for theming:
+the objects, their instance dicts and the '_kw' and '_dont_edit' containers of the widget and of its components."""
+import sys
+import tracemalloc
+
+from BetterDirectGui.DirectGui import *
+from BetterDirectGui.NewWidgets import *
+from BetterDirectGui.DirectGuiBase import DirectGuiWidget
+
+widgets = [
+    # DirectGui widgets
+    (DirectButton, dict(text="Button")),
+    (DirectCheckBox, dict()),
+    (DirectCheckButton, dict(text="Check")),
+    (OkCancelDialog, dict(text="Dialog")),
+    (DirectEntry, dict(enteredText="init text")),
+    (DirectFrame, dict(frameSize=(-.5, .5, -.5, .5))),
+    (DirectLabel, dict(text="Label")),
+    (DirectOptionMenu, dict(items=["item1", "item2", "item3"], popupMarker_numStates=2)),
+    (DirectRadioButton, dict(text="Radio")),
+    (DirectScrollBar, dict()),
+    (DirectScrolledFrame, dict()),
+    (DirectScrolledList, dict(items=[f"item{i}" for i in range(16)])),
+    (DirectSlider, dict()),
+    (DirectWaitBar, dict(value=40)),
+
+    # NewWidgets widgets,
+    (DraggableTile, dict()),
+    (DraggableItem, dict()),
+]
+
+
+def bookkeeping_size(widget) -> int:
+    """Size of the object, instance dict, '_kw' and '_dont_edit' of widget and all of its widget components."""
+    size = 0
+    stack = [widget]
+    while stack:
+        gui = stack.pop()
+        size += sys.getsizeof(gui) + sys.getsizeof(gui.__dict__)  # the object itself holds the slots
+        for name in ("_kw", "_dont_edit"):
+            value = getattr(gui, name, None)
+            if isinstance(value, (dict, set)):  # the shared empty containers are not counted
+                size += sys.getsizeof(value)
+        for name in gui.components():
+            comp = gui.component(name)
+            if isinstance(comp, DirectGuiWidget):
+                stack.append(comp)
+    return size
+
+
+count = 200
+for widget_class, kwargs in widgets:
+    widget_class(**kwargs).destroy()  # the first instance compiles the option schema
+
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    created = [widget_class(**kwargs) for _ in range(count)]
+    total = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+
+    bookkeeping = sum(bookkeeping_size(widget) for widget in created)
+    print(f"{widget_class.__name__:20} {total / count:7.0f} bytes per widget, "
+          f"{bookkeeping / count:6.0f} bytes of bookkeeping")
+    for widget in created:
+        widget.destroy()
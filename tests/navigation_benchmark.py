@@ -0,0 +1,79 @@
+"""Times keyboard navigation (tab, shift-tab and the arrow keys) in menus with many widgets:
+a few panels with rows of buttons in each, a panel with one long list of buttons,
+and buttons next to large panels without anything selectable (like a text log).
+The grid of buttons is also measured with spatial navigation, where the arrow keys move on screen,
+and the panels with a dialog on top, which confines navigation to the dialog."""
+import time
+
+from BetterDirectGui.DirectGui import *
+
+
+def create_panels(panels, rows):
+    """Panels next to each other, with rows of buttons (and a non-selectable label next to each button)."""
+    root = DirectFrame(frameSize=(-1, 1, -1, 1), scale=0.5)
+    for i in range(panels):
+        panel = DirectFrame(parent=root, frameSize=(-.1, .1, -1, 1), pos=(-.9 + i * .2, 0, 0))
+        for j in range(rows):
+            row = DirectFrame(parent=panel, frameSize=(-.1, .1, -.02, .02), pos=(0, 0, .95 - j * .04))
+            DirectLabel(parent=row, text=f"row {j}", scale=0.01, pos=(-.05, 0, 0))
+            DirectButton(parent=row, text=f"button {i}.{j}", scale=0.01, pos=(.05, 0, 0))
+    return root
+
+
+def create_list(length):
+    root = DirectFrame(frameSize=(-1, 1, -1, 1), scale=0.5)
+    for i in range(length):
+        DirectButton(parent=root, text=f"item{i}", scale=0.01, pos=(0, 0, .95 - i * .0035))
+    return root
+
+
+def create_buttons_and_log(buttons, lines):
+    """Buttons, each followed by a panel of labels ('lines' labels in total)."""
+    root = DirectFrame(frameSize=(-1, 1, -1, 1), scale=0.5)
+    for i in range(buttons):
+        DirectButton(parent=root, text=f"button{i}", scale=0.02, pos=(-.5, 0, .9 - i * .1))
+        log = DirectFrame(parent=root, frameSize=(-.4, .4, -1, 1), pos=(.5, 0, 0))
+        for j in range(lines // buttons):
+            DirectLabel(parent=log, text=f"line {j}", scale=0.01, pos=(0, 0, .95 - j * .02))
+    return root
+
+
+def create_grid(columns, rows):
+    root = DirectFrame(frameSize=(-1, 1, -1, 1), scale=0.5)
+    for i in range(columns):
+        for j in range(rows):
+            DirectButton(parent=root, text=f"{i}.{j}", scale=0.01, pos=(-.95 + i * 1.9 / columns, 0, .95 - j * 1.9 / rows))
+    return root
+
+
+def create_panels_and_dialog(panels, rows):
+    root = create_panels(panels, rows)
+    OkCancelDialog(parent=root, text="Dialog", focusScope=True)  # navigation stays in the dialog while it is shown
+    return root
+
+
+def measure(name, root, presses=200, spatial_navigation=False):
+    controller = base.gui_controller
+    controller.spatial_navigation = spatial_navigation
+    controller.current_selection = None
+    controller.base_np.node().getBounds()  # found while culling the first frame, when there is a window
+    results = []
+    for key in ("tab", "shift-tab", "arrow_down", "arrow_up"):
+        start = time.perf_counter()
+        for _ in range(presses):
+            base.messenger.send(key)
+        results.append(f"{key} {(time.perf_counter() - start) / presses * 1e6:.0f} us")
+
+    print(f"{name}: " + ", ".join(results) + " per press")
+    controller.current_selection = None
+    controller.spatial_navigation = False
+    root.destroy()
+
+
+measure("4 panels x 25 rows", create_panels(4, 25))
+measure("10 panels x 50 rows", create_panels(10, 50))
+measure("list of 500", create_list(500))
+measure("10 buttons and 500 labels", create_buttons_and_log(10, 500))
+measure("10 panels x 50 rows with a dialog", create_panels_and_dialog(10, 50))
+measure("grid of 40 x 25", create_grid(40, 25))
+measure("grid of 40 x 25, spatial navigation", create_grid(40, 25), spatial_navigation=True)
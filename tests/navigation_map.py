@@ -0,0 +1,44 @@
+"""Changes the navigationMap of single widgets, the change must not show up in any other widget.
+The widgets share the default navigationMap until their own is changed."""
+from BetterDirectGui.DirectGui import *
+from BetterDirectGui.GuiTools import Themes
+
+first = DirectButton(text="first", scale=0.1, pos=(-0.5, 0, 0.3))
+second = DirectButton(text="second", scale=0.1, pos=(0, 0, 0.3))
+third = DirectButton(text="third", scale=0.1, pos=(0.5, 0, 0.3))
+default = dict(DirectButton._default_navigation_map)
+
+
+def check_defaults(*widgets):
+    for widget in widgets:
+        assert dict(widget["navigationMap"]) == default, f"{widget['text']} has {widget['navigationMap']}"
+    assert dict(DirectButton._default_navigation_map) == default, "the shared default was changed"
+
+
+# written directly, like in the README
+first["navigationMap"]["f"] = third
+assert first["navigationMap"]["f"] is third
+check_defaults(second, third)
+
+# with override_navigation_map, which also sets the opposite direction of the other widget
+second.override_navigation_map("u", first)
+assert second["navigationMap"]["u"] is first and first["navigationMap"]["d"] is second
+check_defaults(third)
+
+# a copy gets its own navigationMap
+copy = first.copy()
+copy["navigationMap"]["b"] = second
+assert first["navigationMap"]["b"] is True
+check_defaults(third)
+
+# reset to the shared default, then written again
+third["navigationMap"] = third.get_default("navigationMap")
+third["navigationMap"]["i"] = first
+check_defaults(DirectButton(text="new"))
+
+# themes don't bring the shared default back
+base.gui_controller.set_theme(Themes.dark_theme)
+base.gui_controller.clear_theme()
+second["navigationMap"]["o"] = third
+check_defaults(DirectButton(text="new"))
+print("the navigationMap of each widget is its own")
@@ -0,0 +1,21 @@
+"""Opens an option menu after the theme was switched while its popup was hidden.
+With lazy theming the popup is only themed when it is opened, which rebuilds it, the menu has to open anyway."""
+from BetterDirectGui.DirectGui import *
+from BetterDirectGui.GuiTools import Themes
+
+menu = DirectOptionMenu(items=["first", "second", "third"], scale=0.1, pos=(-0.3, 0, 0.3))
+base.gui_controller.set_theme(Themes.dark_theme)
+menu.showPopupMenu()
+
+assert not menu.popupMenu.isHidden(), "the popup menu is hidden after opening it"
+assert not menu.cancelFrame.isHidden(), "the cancel frame is hidden after opening the popup menu"
+assert base.gui_controller.navigation_root == menu.popupMenu, "keyboard navigation is not confined to the popup menu"
+
+# opening it again after switching the theme back
+menu.hidePopupMenu()
+base.gui_controller.set_theme(Themes.default_theme)
+menu.showPopupMenu()
+
+assert not menu.popupMenu.isHidden(), "the popup menu is hidden after opening it again"
+assert not menu.cancelFrame.isHidden(), "the cancel frame is hidden after opening the popup menu again"
+print("the option menu opens after theme switches")
@@ -0,0 +1,23 @@
+"""Shows the values of a slider and an entry in a label, with observers instead of polling the values every frame.
+Dragging the slider or typing in the entry only updates the label once per frame."""
+from BetterDirectGui.DirectGui import *
+
+slider = DirectSlider(pos=(0, 0, 0.3), scale=0.5)
+entry = DirectEntry(pos=(-0.5, 0, 0), scale=0.08, width=12)
+label = DirectLabel(pos=(0, 0, -0.3), scale=0.08, text="")
+updates = [0]
+
+
+def show_value(name, value):
+    updates[0] += 1
+    label["text"] = f"{name}: {value}  ({updates[0]} updates)"
+
+
+slider.observe("value", lambda value: show_value("slider", round(value, 2)))
+slider.observe("thumb_frameColor", lambda value: show_value("thumb color", value))
+entry.observe("enteredText", lambda value: show_value("entry", value))
+
+# several changes in the same frame give a single update
+for i in range(10):
+    slider["value"] = i / 10
+slider["thumb_frameColor"] = (0.2, 0.6, 0.2, 1)
@@ -0,0 +1,79 @@
+"""Times the spatial index of the widget frames (base.gui_controller.spatial_index) with 10000 widgets:
+finding all frames, an update when nothing has changed, updates after a widget or a whole row has moved,
+after a widget is hidden, destroyed or highlighted, and point, rectangle and nearest queries.
+The queries are compared with looking at the frame of each widget."""
+import random
+import time
+
+from BetterDirectGui.DirectGui import *
+from BetterDirectGui.GuiTools import GuiUtil
+from BetterDirectGui.GuiTools.SpatialIndex import WidgetIndex
+
+
+def create_rows(rows, columns):
+    """Rows of buttons, each row in its own frame."""
+    root = DirectFrame(frameSize=(-1, 1, -1, 1), scale=0.9)
+    for i in range(rows):
+        row = DirectFrame(parent=root, frameSize=(-1, 1, -.005, .005), pos=(0, 0, .99 - i * 2 / rows))
+        for j in range(columns):
+            DirectButton(parent=row, frameSize=(-.008, .008, -.005, .005), pos=(-.99 + j * 2 / columns, 0, 0))
+    return root
+
+
+def timed(function, repeats=1):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = function()
+    return (time.perf_counter() - start) / repeats, result
+
+
+def all_frames(root):
+    stack = [root]
+    frames = []
+    while stack:
+        gui = stack.pop()
+        frames.append((gui, GuiUtil.get_frame_rect(gui, base.aspect2d)))
+        stack.extend(GuiUtil.get_gui_children(gui))
+    return frames
+
+
+def measure(name, root):
+    base.aspect2d.node().getBounds()  # found while culling the first frame, when there is a window
+    index = WidgetIndex(base.aspect2d)
+    build, _ = timed(index.update)
+    unchanged, _ = timed(index.update, 1000)
+    print(f"{name}: {len(index)} widgets, finding all frames {build * 1000:.0f} ms, "
+          f"update without changes {unchanged * 1e6:.1f} us")
+
+    rows = GuiUtil.get_gui_children(root)
+    buttons = [button for row in rows for button in GuiUtil.get_gui_children(row)]
+    random.seed(0)
+    changes = {
+        "move one button": lambda: random.choice(buttons).setX(random.uniform(-1, 1)),
+        "move one row": lambda: random.choice(rows).setX(random.uniform(-.1, .1)),
+        "hide and show one button": lambda: random.choice(buttons).hide() if random.random() < .5 else
+        random.choice(buttons).show(),
+        "highlight one button": lambda: random.choice(buttons).setColorScale(random.random(), 1, 1, 1),
+    }
+    for change, function in changes.items():
+        duration = 0.0
+        for _ in range(50):
+            function()
+            duration += timed(index.update)[0]
+        print(f"  update after '{change}' {duration / 50 * 1e6:.0f} us")
+
+    points = [(random.uniform(-.9, .9), random.uniform(-.9, .9)) for _ in range(1000)]
+    point_query, _ = timed(lambda: [index.widgets_at(x, z) for x, z in points])
+    rect_query, _ = timed(lambda: [index.widgets_in((x, x + .1, z, z + .1)) for x, z in points])
+    nearest_query, _ = timed(lambda: [index.nearest(x, z) for x, z in points])
+    walk, frames = timed(lambda: all_frames(root))
+    print(f"  per query: point {point_query * 1000:.1f} us, rectangle (0.1 x 0.1) {rect_query * 1000:.1f} us, "
+          f"nearest {nearest_query * 1000:.1f} us; looking at all {len(frames)} frames {walk * 1000:.0f} ms")
+
+    root.destroy()
+    removed, _ = timed(index.update)
+    print(f"  update after destroying everything {removed * 1000:.0f} ms, {len(index)} widgets left")
+
+
+measure("100 rows x 100 buttons", create_rows(100, 100))
+measure("10 rows x 1000 buttons", create_rows(10, 1000))
@@ -0,0 +1,48 @@
+"""Compares texture binds and draw calls of the most_gui_types screen, with the dark theme and with the
+dark theme packed into a texture atlas.
+The numbers are counted by walking the scene-graph in render order (like the 2d scene is drawn),
+so this works without a window."""
+import panda3d.core as p3d
+
+import tests.most_gui_types as tg
+from BetterDirectGui.GuiTools import Themes, TextureAtlas
+
+
+def count_draws(np: p3d.NodePath, state: p3d.RenderState, counts: dict):
+    node = np.node()
+    if node.isOverallHidden():
+        return
+
+    state = state.compose(np.getState())
+    if isinstance(node, p3d.GeomNode):
+        for i in range(node.getNumGeoms()):
+            textures = node.getGeomState(i).compose(state).getAttrib(p3d.TextureAttrib)
+            texture = textures.getTexture() if textures is not None else None
+            counts["draw calls"] += 1
+            if texture is not None and texture != counts["last texture"]:
+                counts["texture binds"] += 1
+            if texture is not None:
+                counts["last texture"] = texture
+    elif isinstance(node, p3d.TextNode):
+        count_draws(p3d.NodePath(node.getInternalGeom()), state, counts)
+
+    if isinstance(node, p3d.PGItem):  # only the current state of the gui item is drawn
+        count_draws(node.getStateDef(node.getState()), state, counts)
+
+    for child in np.getChildren():
+        count_draws(child, state, counts)
+
+
+def measure(name):
+    counts = {"draw calls": 0, "texture binds": 0, "last texture": None}
+    count_draws(base.aspect2d, p3d.RenderState.makeEmpty(), counts)
+    print(f"{name}: {counts['draw calls']} draw calls, {counts['texture binds']} texture binds")
+
+
+gui = tg.GUI(base.aspect2d)
+base.gui_controller.set_theme(Themes.dark_theme, 1)
+measure("dark_theme")
+
+atlas_theme = TextureAtlas.pack_theme(Themes.dark_theme, image_scale=0.5)
+base.gui_controller.set_theme(atlas_theme, 2)
+measure("dark_theme in an atlas")
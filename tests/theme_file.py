@@ -0,0 +1,9 @@
+"""Shows the most_gui_types screen with a theme loaded from a theme file."""
+import os
+
+import tests.most_gui_types as tg
+from BetterDirectGui.GuiTools import ThemeLoader
+
+gui = tg.GUI(base.aspect2d)
+theme = ThemeLoader.load_theme(os.path.join(os.path.dirname(__file__), "example_theme.json"), compile=True)
+base.gui_controller.set_theme(theme, 1)
@@ -0,0 +1,18 @@
+"""Builds themes from widgets, including widgets created without any options
+(which share one read-only mapping for the options set by the user)."""
+from BetterDirectGui.DirectGui import *
+from BetterDirectGui.GuiTools import ThemeUtil
+
+plain = DirectButton()
+styled = DirectLabel(text="styled", text_fg=(1, 0, 0, 1), frameColor=(0.2, 0.2, 0.2, 1), scale=0.1)
+
+theme = ThemeUtil.create_theme_from_gui(plain)
+assert theme == {"DirectButton": {}}, theme
+theme["DirectButton"]["relief"] = 2  # the theme has a dict of its own
+assert dict(plain._kw) == {} and dict(DirectButton()._kw) == {}
+
+theme = ThemeUtil.create_theme_from_guis([plain, styled], general_options={"relief": 1})
+assert theme["DirectButton"] == {} and theme["general"] == {"relief": 1}
+assert theme["DirectLabel"]["text_fg"] == (1, 0, 0, 1)
+styled.set_theme(theme, 1)
+print("themes can be created from widgets without options")
@@ -0,0 +1,65 @@
+"""Times setting a theme on deep and wide trees of widgets (like the nested frames in nesting_test.py, but larger),
+and the walk over the tree on its own, done with get_gui_children at every level and with the single pass
+used by the theme propagation."""
+import time
+
+from BetterDirectGui.DirectGui import *
+from BetterDirectGui.GuiTools import Themes, GuiUtil
+
+
+def create_deep(depth):
+    """Nested frames, each with a button."""
+    root = parent = DirectFrame(frameSize=(-1, 1, -1, 1), scale=0.5)
+    for i in range(depth):
+        DirectButton(parent=parent, text=f"button{i}", scale=0.2, pos=(0, 0, 0.7))
+        parent = DirectFrame(parent=parent, frameSize=(-1, 1, -1, 1), scale=0.95)
+    return root
+
+
+def create_wide(width):
+    """Rows of buttons in a frame."""
+    root = DirectFrame(frameSize=(-1, 1, -1, 1), scale=0.5)
+    for i in range(width):
+        row = DirectFrame(parent=root, frameSize=(-1, 1, -.05, .05), pos=(0, 0, .9 - i * .1))
+        DirectButton(parent=row, text=f"button{i}", scale=0.05)
+    return root
+
+
+def walk_recursive(widget):
+    count = 1
+    for child in GuiUtil.get_gui_children(widget, include_stashed=True):
+        count += walk_recursive(child)
+    return count
+
+
+def walk_single_pass(widget):
+    count = 0
+    stack = [widget]
+    while stack:
+        GuiUtil.add_gui_children(stack.pop(), stack)
+        count += 1
+    return count
+
+
+def measure(name, root):
+    start = time.perf_counter()
+    count = walk_recursive(root)
+    recursive = time.perf_counter() - start
+
+    start = time.perf_counter()
+    walk_single_pass(root)
+    single_pass = time.perf_counter() - start
+
+    start = time.perf_counter()
+    root.set_theme(Themes.dark_theme, 1)
+    theming = time.perf_counter() - start
+
+    print(f"{name}: {count} widgets, walk {recursive * 1000:.2f} ms recursive / {single_pass * 1000:.2f} ms single pass, "
+          f"set_theme {theming * 1000:.1f} ms ({theming / count * 1e6:.0f} us per widget)")
+    root.destroy()
+
+
+for size in (25, 50, 100):
+    measure(f"deep {size}", create_deep(size))
+for size in (25, 50, 100):
+    measure(f"wide {size}", create_wide(size))
@@ -0,0 +1,61 @@
+"""Counts the options reconfigured when switching between the default and the dark theme,
+with and without 'diff'."""
+import time
+
+from BetterDirectGui.DirectGui import *
+import direct.gui.DirectGuiBase as DirectGuiBase
+from BetterDirectGui.GuiTools import Themes
+
+calls = {"configure": 0, "frame resets": 0}
+counted = (
+    (DirectGuiBase.DirectGuiBase, "configure", "configure"),
+    # the frame is reset by the resetFrameSize of DirectGui, or setFrameSize for widgets that override it
+    (DirectGuiBase.DirectGuiWidget, "resetFrameSize", "frame resets"),
+    (DirectCheckButton, "setFrameSize", "frame resets"),
+    (DirectRadioButton, "setFrameSize", "frame resets"),
+)
+originals = {(cls, name): cls.__dict__[name] for cls, name, _ in counted}
+
+
+def count_calls(func, counter):
+    def wrapper(*args, **kwargs):
+        calls[counter] += 1
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+def create_gui(rows=20):
+    root = DirectFrame(frameSize=(-1, 1, -1, 1), scale=0.5)
+    for i in range(rows):
+        row = DirectFrame(parent=root, frameSize=(-1, 1, -.05, .05), pos=(0, 0, .9 - i * .1))
+        DirectButton(parent=row, text=f"button{i}", scale=0.05, pos=(-.6, 0, 0))
+        DirectCheckButton(parent=row, text=f"check{i}", scale=0.05, pos=(-.2, 0, 0))
+        DirectSlider(parent=row, scale=0.2, pos=(.3, 0, 0))
+        DirectLabel(parent=row, text=f"label{i}", scale=0.05, pos=(.8, 0, 0))
+
+    return root
+
+
+def switch_theme(diff):
+    root = create_gui()
+    base.gui_controller.set_theme(Themes.default_theme, 1)
+
+    for cls, name, counter in counted:
+        setattr(cls, name, count_calls(originals[cls, name], counter))
+    calls["configure"] = calls["frame resets"] = 0
+    start = time.perf_counter()
+    base.gui_controller.set_theme(Themes.dark_theme, 2, diff=diff)
+    duration = time.perf_counter() - start
+    for cls, name, _ in counted:
+        setattr(cls, name, originals[cls, name])
+
+    print(f"diff={diff}: {calls['configure']} configure calls, "
+          f"{calls['frame resets']} frame resets, {duration * 1000:.1f} ms")
+
+    root.destroy()
+    base.gui_controller.clear_theme()
+
+
+switch_theme(diff=False)
+switch_theme(diff=True)